@@ -0,0 +1,113 @@
+"""Asyncio front end for IntelligentMemoryManager.
+
+Model inference, POS tagging and log writes run on an executor instead of the
+event loop. Requests that arrive within ``max_wait`` seconds of each other are
+coalesced into one micro-batch of at most ``max_batch_size`` requests: runs of
+adds go through add_memories and runs of queries through
+get_relevant_memories_batch, so each run costs a single ``encode`` call. The
+wait is skipped while the last batch held a single request, so a lone caller
+pays no added latency.
+
+Batches are processed one at a time and in arrival order, so the wrapped
+manager is never used from two threads at once and every request sees the
+effect of the requests submitted before it. The executor must therefore share
+memory with the event loop (a thread pool; None uses the loop's default).
+"""
+import asyncio
+from concurrent.futures import Executor
+from itertools import groupby
+from typing import Any, Iterable, List, Optional, Tuple
+
+from intelligent_memory import IntelligentMemory, IntelligentMemoryManager
+
+
+class AsyncIntelligentMemoryManager:
+    def __init__(self, manager: IntelligentMemoryManager, executor: Optional[Executor] = None,
+                 max_batch_size: int = 64, max_wait: float = 0.002):
+        self.manager = manager
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[str, Any, asyncio.Future]] = []
+        self._batch_full: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._last_batch_size = 0
+
+    async def add_memory(self, content: str, context: str) -> IntelligentMemory:
+        """Add a new memory with intelligent processing."""
+        return await self._submit('add', (content, context))
+
+    async def add_memories(self, items: Iterable[Tuple[str, str]]) -> List[IntelligentMemory]:
+        """Add many (content, context) memories; they are batched with other pending adds."""
+        return list(await asyncio.gather(*(self._submit('add', item) for item in items)))
+
+    async def get_relevant_memories(self, query: str, top_k: int = 5) -> List[Tuple[IntelligentMemory, float]]:
+        """Get relevant memories using semantic search."""
+        return await self._submit('query', (query, top_k))
+
+    async def save_memories(self):
+        await self._submit('save', None)
+
+    async def _submit(self, kind: str, payload: Any):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((kind, payload, future))
+        if self._batch_full is not None and len(self._pending) >= self.max_batch_size:
+            self._batch_full.set()
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+        return await future
+
+    async def _run(self):
+        """Process pending requests in micro-batches until none are left."""
+        loop = asyncio.get_running_loop()
+        self._batch_full = asyncio.Event()
+        while self._pending:
+            # Give concurrent callers up to max_wait to join the batch
+            if 1 < self._last_batch_size and len(self._pending) < self.max_batch_size:
+                self._batch_full.clear()
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            self._last_batch_size = len(batch)
+            requests = [(kind, payload) for kind, payload, _ in batch]
+            try:
+                outcomes = await loop.run_in_executor(self.executor, self._process, requests)
+            except Exception as e:
+                outcomes = [(False, e)] * len(batch)
+
+            for (_, _, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue  # Caller was cancelled
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _process(self, requests: List[Tuple[str, Any]]) -> List[Tuple[bool, Any]]:
+        """Run a batch on the executor; returns (succeeded, result or exception) per request.
+
+        An exception fails every request of the run (consecutive requests of one kind) it came from.
+        """
+        outcomes = []
+        for kind, run in groupby(requests, key=lambda request: request[0]):
+            payloads = [payload for _, payload in run]
+            try:
+                if kind == 'add':
+                    results = self.manager.add_memories(payloads, batch_size=len(payloads))
+                elif kind == 'query':
+                    # The top max(top_k) is exact, so every shorter top_k is a prefix of it
+                    top_k = max(k for _, k in payloads)
+                    ranked = self.manager.get_relevant_memories_batch([query for query, _ in payloads], top_k)
+                    results = [memories[:max(k, 0)] for memories, (_, k) in zip(ranked, payloads)]
+                else:
+                    self.manager.save_memories()
+                    results = [None] * len(payloads)
+                outcomes.extend((True, result) for result in results)
+            except Exception as e:
+                outcomes.extend((False, e) for _ in payloads)
+        return outcomes
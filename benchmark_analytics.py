@@ -0,0 +1,85 @@
+"""Time analyze_memory_patterns from running aggregates against the pandas rebuild.
+
+Usage:
+    python benchmark_analytics.py [--memories 100000] [--inserts 1000] [--polls 100]
+
+The store is filled with --memories synthetic memories (importances on ten
+levels like the discrete scores of _calculate_importance, up to five tags
+each), then --inserts more arrive at capacity, so every insert evicts one.
+The run fails loudly unless the incremental analysis matches
+analyze_memory_patterns(rebuild=True) after the fill and after the inserts,
+and reports the latency of a dashboard poll both ways.
+"""
+import argparse
+import math
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from benchmark_utils import HashEmbeddingModel, synthetic_memories
+from intelligent_memory import IntelligentMemoryManager
+
+
+def make_memories(count, seed=0):
+    rng = random.Random(seed)
+    memories = synthetic_memories(HashEmbeddingModel(dim=32), count, seed)
+    for memory in memories:
+        memory.importance = round(memory.importance * 10) / 10
+        memory.memory_type = 'active' if memory.importance > 0.7 else 'archive'
+        memory.tags = list(dict.fromkeys(memory.content.split()))[:rng.randint(0, 5)]
+    return memories
+
+
+def check(manager):
+    """Assert that the incremental analysis agrees with the pandas rebuild."""
+    incremental = manager.analyze_memory_patterns()
+    rebuilt = manager.analyze_memory_patterns(rebuild=True)
+    for name, value in rebuilt['importance_stats'].items():
+        assert math.isclose(incremental['importance_stats'][name], value, rel_tol=1e-9), name
+    for name in ('context_distribution', 'memory_type_distribution'):
+        assert incremental[name] == rebuilt[name], name
+    # Tags tied at the cut-off may differ; their counts may not
+    tags = incremental['common_tags']
+    assert sorted(tags.values()) == sorted(rebuilt['common_tags'].values())
+    assert all(manager.stats.tags[tag] == count for tag, count in tags.items())
+
+
+def poll_ms(analyze, polls):
+    start = time.perf_counter()
+    for _ in range(polls):
+        analyze()
+    return (time.perf_counter() - start) / polls * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--memories', type=int, default=100000)
+    parser.add_argument('--inserts', type=int, default=1000)
+    parser.add_argument('--polls', type=int, default=100)
+    args = parser.parse_args()
+
+    memories = make_memories(args.memories + args.inserts)
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = IntelligentMemoryManager(storage_dir=storage_dir, model=HashEmbeddingModel(dim=32), fsync='never')
+        manager.memory_capacity = args.memories
+        manager.memories = memories[:args.memories]
+        manager._reindex()
+        check(manager)
+
+        for memory in memories[args.memories:]:
+            memory.timestamp = datetime.now().timestamp()
+            manager.memories.append(memory)
+            manager._register(memory)
+            manager._manage_capacity()
+        check(manager)
+
+        incremental = poll_ms(manager.analyze_memory_patterns, args.polls)
+        rebuilt = poll_ms(lambda: manager.analyze_memory_patterns(rebuild=True), max(args.polls // 20, 1))
+    print(f"{args.memories} memories, {args.inserts} evicting inserts: incremental analysis matches pandas")
+    print(f"{'incremental (ms/poll)':>22} {'pandas rebuild (ms/poll)':>25}")
+    print(f"{incremental:>22.3f} {rebuilt:>25.1f}")
+
+
+if __name__ == '__main__':
+    main()
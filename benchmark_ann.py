@@ -0,0 +1,65 @@
+"""Benchmark approximate (IVF) vs exact (flat) vector search: recall and latency.
+
+Usage:
+    python benchmark_ann.py [--sizes 10000 100000] [--n-probe 1 2 4 8 16 32]
+"""
+import argparse
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_utils import HashEmbeddingModel, random_sentence, time_call
+from vector_index import FlatIndex, IVFIndex
+
+
+def build(index, vectors):
+    for memory_id, vector in enumerate(vectors):
+        index.add(memory_id, vector)
+    return index
+
+
+def mean_query_ms(index, queries, k):
+    return time_call(lambda: [index.search(q, k) for q in queries], repeat=3) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--n-probe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    model = HashEmbeddingModel()
+    rng = random.Random(0)
+    queries = model.encode([random_sentence(rng, length=4) for _ in range(args.queries)])
+
+    for size in args.sizes:
+        vectors = model.encode([random_sentence(rng) for _ in range(size)])
+        flat = build(FlatIndex(), vectors)
+        start = time.perf_counter()
+        ivf = build(IVFIndex(), vectors)
+        build_ms = (time.perf_counter() - start) * 1000
+        exact = [set(flat.search(q, args.top_k)[0].tolist()) for q in queries]
+
+        print(f"\n{size} vectors (IVF: {len(ivf._centroids)} lists, built in {build_ms:.0f} ms)")
+        print(f"{'backend':>12} {'ms/query':>10} {'recall@' + str(args.top_k):>10}")
+        print(f"{'flat':>12} {mean_query_ms(flat, queries, args.top_k):>10.3f} {1.0:>10.3f}")
+        for n_probe in args.n_probe:
+            ivf.n_probe = n_probe
+            found = [set(ivf.search(q, args.top_k)[0].tolist()) for q in queries]
+            recall = np.mean([len(a & b) / len(a) for a, b in zip(exact, found)])
+            print(f"{'ivf/' + str(n_probe):>12} {mean_query_ms(ivf, queries, args.top_k):>10.3f} {recall:>10.3f}")
+
+        evicted = rng.sample(range(size), size // 100)
+        remove_ms = time_call(lambda: [ivf.remove(i) for i in evicted], repeat=1) / len(evicted) * 1000
+        with tempfile.TemporaryDirectory() as storage_dir:
+            ivf.save(storage_dir)
+            load_ms = time_call(lambda: IVFIndex().load(storage_dir), repeat=3) * 1000
+        print(f"ivf remove: {remove_ms:.3f} ms/vector, load from disk: {load_ms:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
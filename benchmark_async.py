@@ -0,0 +1,93 @@
+"""Benchmark query throughput of AsyncIntelligentMemoryManager at 1, 16 and 128 concurrent callers.
+
+Usage:
+    python benchmark_async.py [--memories 10000] [--queries 512] [--callers 1 16 128] [--sentence-transformer]
+
+"serial" awaits one get_relevant_memories call at a time on a single worker
+thread (the manager is not thread-safe), which is what an async server gets by
+off-loading the synchronous API. "micro-batched" goes through
+AsyncIntelligentMemoryManager. By default the offline HashEmbeddingModel is
+given a fixed per-call and per-text inference delay so that batching effects
+resemble a real model; --sentence-transformer uses all-MiniLM-L6-v2 on CPU.
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_memory import AsyncIntelligentMemoryManager
+from benchmark_utils import HashEmbeddingModel, random_sentence, synthetic_memories
+from intelligent_memory import IntelligentMemoryManager
+
+
+class DelayedModel:
+    """Wrap a model so encode() costs per_call + per_text seconds, like CPU inference overhead."""
+
+    def __init__(self, model, per_call=0.004, per_text=0.0002):
+        self.model = model
+        self.per_call = per_call
+        self.per_text = per_text
+
+    def encode(self, texts, **kwargs):
+        time.sleep(self.per_call + self.per_text * len(texts))
+        return self.model.encode(texts, **kwargs)
+
+
+async def run_callers(query, queries, callers):
+    """Split queries across callers concurrently awaiting query(); return queries/second."""
+    async def caller(chunk):
+        for text in chunk:
+            await query(text)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller(queries[i::callers]) for i in range(callers)))
+    return len(queries) / (time.perf_counter() - start)
+
+
+async def measure(manager, queries, callers):
+    serial_executor = ThreadPoolExecutor(max_workers=1)
+    loop = asyncio.get_running_loop()
+
+    async def serial_query(text):
+        return await loop.run_in_executor(serial_executor, manager.get_relevant_memories, text)
+
+    async_manager = AsyncIntelligentMemoryManager(manager, executor=serial_executor)
+    serial = await run_callers(serial_query, queries[0], callers)
+    batched = await run_callers(async_manager.get_relevant_memories, queries[1], callers)
+    serial_executor.shutdown()
+    return serial, batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--memories', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=512)
+    parser.add_argument('--callers', type=int, nargs='+', default=[1, 16, 128])
+    parser.add_argument('--sentence-transformer', action='store_true')
+    args = parser.parse_args()
+
+    if args.sentence_transformer:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+    else:
+        model = DelayedModel(HashEmbeddingModel())
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = IntelligentMemoryManager(storage_dir=storage_dir, model=model)
+        manager.memories = synthetic_memories(HashEmbeddingModel(), args.memories)
+        manager._reindex()
+
+        print(f"{'callers':>8} {'serial (q/s)':>13} {'micro-batched (q/s)':>20}")
+        for callers in args.callers:
+            # Fresh query texts per run, so the embedding cache does not answer them
+            queries = [[f"{random_sentence(rng, 6)} {callers}-{run}-{i}" for i in range(args.queries)]
+                       for run in range(2)]
+            serial, batched = asyncio.run(measure(manager, queries, callers))
+            print(f"{callers:>8} {serial:>13.1f} {batched:>20.1f}")
+
+
+if __name__ == '__main__':
+    main()
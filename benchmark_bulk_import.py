@@ -0,0 +1,131 @@
+"""Check bulk_import against serial add_memories and time it with process pools of several sizes.
+
+Usage:
+    python benchmark_bulk_import.py [--lines 20000] [--batch-size 64] [--processes 0 1 2 4] [--queue-size 4]
+
+The input is a --lines turn synthetic conversation written as JSONL. The run
+fails loudly unless every import creates the same memories (ids, contents,
+contexts, importances, types, tags, related memories and embeddings) as
+add_memories over the same items, both in memory and when the store is
+reloaded from disk; unless an import at half the capacity (which evicts,
+by wall-clock dependent retention scores) stays within the capacity after
+every batch and reloads as it ended, with no evictions left in the log; unless the reader never gets more than --queue-size batches ahead of the
+merge; and unless an import that hits a malformed line leaves the store as
+it was.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_utils import HashEmbeddingModel, synthetic_conversation
+from bulk_import import bulk_import, read_jsonl
+from intelligent_memory import IntelligentMemoryManager
+
+FIELDS = ('memory_id', 'content', 'context', 'importance', 'memory_type', 'tags', 'related_memories')
+
+
+def write_jsonl(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        for turn in synthetic_conversation(lines):
+            f.write(json.dumps({'content': turn.text, 'context': turn.context}) + '\n')
+
+
+def open_manager(storage_dir, capacity):
+    manager = IntelligentMemoryManager(storage_dir=storage_dir, model=HashEmbeddingModel(), fsync='never')
+    manager.memory_capacity = capacity
+    return manager
+
+
+def same_memories(manager, expected):
+    assert len(manager.memories) == len(expected), (len(manager.memories), len(expected))
+    for memory, reference in zip(manager.memories, expected):
+        for field in FIELDS:
+            assert getattr(memory, field) == getattr(reference, field), (memory.memory_id, field)
+        assert np.array_equal(np.asarray(memory.embedding), np.asarray(reference.embedding)), memory.memory_id
+
+
+class CountingReader:
+    """Iterates the input and records how many items were read."""
+
+    def __init__(self, items):
+        self.items = items
+        self.read = 0
+
+    def __iter__(self):
+        for item in self.items:
+            self.read += 1
+            yield item
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--processes', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--queue-size', type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = os.path.join(work_dir, 'transcripts.jsonl')
+        write_jsonl(path, args.lines)
+
+        serial = open_manager(os.path.join(work_dir, 'serial'), args.lines)
+        start = time.perf_counter()
+        serial.add_memories(read_jsonl(path), batch_size=args.batch_size)
+        serial_seconds = time.perf_counter() - start
+        serial_rate = args.lines / serial_seconds
+        tag_share = serial.stage_seconds['tag'] / serial_seconds
+        print(f"{args.lines} lines, batches of {args.batch_size}; "
+              f"POS tagging, the stage run in the pool, is {tag_share:.0%} of serial ingestion")
+        print(f"{'ingestion':>18} {'lines/s':>9}")
+        print(f"{'add_memories':>18} {serial_rate:>9.0f}")
+
+        for processes in args.processes:
+            storage_dir = os.path.join(work_dir, f'bulk{processes}')
+            manager = open_manager(storage_dir, args.lines)
+            reader = CountingReader(read_jsonl(path))
+            ahead = (args.queue_size + 1) * args.batch_size
+
+            def check_backpressure(state):
+                assert reader.read - state.memories <= ahead, (reader.read, state.memories)
+
+            result = bulk_import(manager, reader, processes, args.batch_size, args.queue_size, check_backpressure)
+            assert result.memories == args.lines
+            same_memories(manager, serial.memories)
+            same_memories(open_manager(storage_dir, args.lines), serial.memories)
+            print(f"{f'bulk_import/{processes}':>18} {result.per_second:>9.0f}")
+
+        # Evictions during an import reach the disk through the snapshot only
+        half = args.lines // 2
+        evicting_dir = os.path.join(work_dir, 'bulk-half')
+        evicting = open_manager(evicting_dir, half)
+
+        def check_capacity(state):
+            assert len(evicting.memories) <= half, (state.memories, len(evicting.memories))
+
+        bulk_import(evicting, path, max(args.processes), args.batch_size, args.queue_size, check_capacity)
+        assert len(evicting.memories) == half
+        assert os.path.getsize(os.path.join(evicting_dir, 'memories.log')) == 0
+        same_memories(open_manager(evicting_dir, half), evicting.memories)
+
+        # A malformed line aborts the import and leaves the store as it was
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('not json\n')
+        before = [m.memory_id for m in manager.memories]
+        try:
+            bulk_import(manager, path, max(args.processes), args.batch_size, args.queue_size)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("a malformed line did not fail the import")
+        assert [m.memory_id for m in manager.memories] == before
+        assert [m.memory_id for m in open_manager(storage_dir, args.lines).memories] == before
+    print("every import matched serial ingestion")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Stress thread_safe memory managers with many threads mixing adds, queries and saves.
+
+Usage:
+    python benchmark_concurrency.py [--threads 1 4 16] [--ops 8000] [--add-ratio 0.2]
+
+For every manager and thread count, the threads share ops operations (adds,
+keyword or semantic queries, and an occasional save_memories), so every run
+ends with a store of the same size. Afterwards the run fails loudly if any add
+was lost or duplicated, or if the store on disk does not reload to exactly the
+memories in RAM.
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+
+from benchmark_utils import HashEmbeddingModel, random_sentence
+from intelligent_memory import IntelligentMemoryManager
+from memory_manager import MemoryManager
+from persistent_memory import PersistentMemoryManager
+from sqlite_memory import SQLiteMemoryManager
+
+
+def make_memory(storage_dir):
+    return MemoryManager(core_memory_size=50, recent_memory_size=100, thread_safe=True)
+
+
+def make_persistent(storage_dir):
+    return PersistentMemoryManager(storage_dir, compact_threshold=200, thread_safe=True)
+
+
+def make_sqlite(storage_dir):
+    return SQLiteMemoryManager(storage_dir, thread_safe=True)
+
+
+def make_intelligent(storage_dir, model=HashEmbeddingModel()):
+    manager = IntelligentMemoryManager(storage_dir=storage_dir, model=model, compact_threshold=200, thread_safe=True)
+    manager.memory_capacity = 10 ** 9  # Every add must survive for the lost-update check
+    return manager
+
+
+MANAGERS = {
+    'MemoryManager': make_memory,
+    'PersistentMemoryManager': make_persistent,
+    'SQLiteMemoryManager': make_sqlite,
+    'IntelligentMemoryManager': make_intelligent,
+}
+
+
+def all_contents(manager):
+    if isinstance(manager, IntelligentMemoryManager):
+        return [m.content for m in manager.memories]
+    if isinstance(manager, MemoryManager):
+        return [m.content for m in manager.iter_memories()]
+    return [m.content for m in manager.get_session_memories()]
+
+
+def worker(manager, thread_id, ops, add_ratio, added, errors):
+    rng = random.Random(thread_id)
+    try:
+        for op in range(ops):
+            roll = rng.random()
+            if roll < add_ratio:
+                content = f"thread {thread_id} op {op} {random_sentence(rng, 6)}"
+                if isinstance(manager, IntelligentMemoryManager):
+                    manager.add_memory(content, "stress")
+                else:
+                    manager.add_memory(content, rng.random(), "stress")
+                added.append(content)
+            elif roll < add_ratio + 0.005 and hasattr(manager, 'save_memories'):
+                manager.save_memories()
+            else:
+                manager.get_relevant_memories(random_sentence(rng, 3))
+    except Exception as e:
+        errors.append(e)
+        raise
+
+
+def stress(name, threads, ops, add_ratio):
+    """Return operations/second; raises AssertionError on a lost update or torn store."""
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = MANAGERS[name](storage_dir)
+        added, errors = [], []
+        workers = [
+            threading.Thread(target=worker, args=(manager, i, ops // threads, add_ratio, added, errors))
+            for i in range(threads)
+        ]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        assert not errors, errors
+
+        contents = all_contents(manager)
+        assert sorted(contents) == sorted(added), f"{name}: {len(contents)} memories for {len(added)} adds"
+
+        if name != 'MemoryManager':
+            manager.save_memories()
+            if name == 'SQLiteMemoryManager':
+                manager.close()
+            reloaded = MANAGERS[name](storage_dir)
+            assert sorted(all_contents(reloaded)) == sorted(added), f"{name}: store on disk differs after reload"
+        return ops // threads * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--ops', type=int, default=8000, help="operations per run, split across the threads")
+    parser.add_argument('--add-ratio', type=float, default=0.2)
+    parser.add_argument('--managers', nargs='+', default=list(MANAGERS), choices=list(MANAGERS))
+    args = parser.parse_args()
+
+    print(f"{'manager':>26} {'threads':>8} {'ops/s':>10}")
+    for name in args.managers:
+        for threads in args.threads:
+            rate = stress(name, threads, args.ops, args.add_ratio)
+            print(f"{name:>26} {threads:>8} {rate:>10.0f}")
+    print("no lost updates, every store reloaded intact")
+
+
+if __name__ == '__main__':
+    main()
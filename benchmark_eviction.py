@@ -0,0 +1,109 @@
+"""Benchmark steady-state inserts into a full IntelligentMemoryManager: full-sort vs incremental eviction.
+
+Usage:
+    python benchmark_eviction.py [--capacity 100000] [--inserts 10000] [--baseline-inserts 20]
+                                 [--importance-levels 0] [--verify]
+
+The store is filled to memory_capacity with synthetic memories (one per minute
+of history, a tenth of them with access counts), then every insert evicts one
+memory. Inserts skip the embedding and tagging pipeline so that only capacity
+management is timed; each one also bumps the access count of a random stored
+memory, as retrieval does. --importance-levels N rounds importances to N
+values, like the discrete scores of _calculate_importance (0 keeps them
+continuous). --verify checks every eviction against a full scan of the
+retention scores.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from benchmark_utils import HashEmbeddingModel, synthetic_memories
+from intelligent_memory import IntelligentMemoryManager
+
+
+class FullSortMemoryManager(IntelligentMemoryManager):
+    """The previous _manage_capacity: score every memory and sort on each eviction."""
+
+    def _manage_capacity(self):
+        if len(self.memories) > self.memory_capacity:
+            current_time = datetime.now().timestamp()
+            retention_scores = [(memory, self._retention_score(memory, current_time)) for memory in self.memories]
+            retention_scores.sort(key=lambda x: x[1], reverse=True)
+            self.memories = [m for m, _ in retention_scores[:self.memory_capacity]]
+            for memory, _ in retention_scores[self.memory_capacity:]:
+                self._unregister(memory)
+                self._log.append({'op': 'evict', 'memory_id': memory.memory_id})
+
+
+def make_memories(count, importance_levels, seed=0):
+    rng = random.Random(seed)
+    memories = synthetic_memories(HashEmbeddingModel(dim=32), count, seed)
+    for memory in memories:
+        if importance_levels:
+            memory.importance = round(memory.importance * importance_levels) / importance_levels
+        if rng.random() < 0.1:
+            memory.access_count = rng.randint(1, 20)
+    return memories
+
+
+def run(manager_class, storage_dir, capacity, inserts, importance_levels, verify=False):
+    """Return the mean time (us) of an insert into a full store."""
+    memories = make_memories(capacity + inserts, importance_levels)
+    manager = manager_class(storage_dir=storage_dir, model=HashEmbeddingModel(dim=32), fsync='never')
+    manager.memory_capacity = capacity
+    manager.memories = memories[:capacity]
+    manager._reindex()
+
+    rng = random.Random(1)
+    elapsed = 0.0
+    for memory in memories[capacity:]:
+        stored = manager.memories[rng.randrange(len(manager.memories))]
+        stored.access_count += 1
+        memory.timestamp = datetime.now().timestamp()
+        if verify:
+            check_lowest(manager)
+
+        start = time.perf_counter()
+        manager.memories.append(memory)
+        manager._register(memory)
+        manager._manage_capacity()
+        elapsed += time.perf_counter() - start
+    assert len(manager.memories) == capacity
+    return elapsed / inserts * 1e6
+
+
+def check_lowest(manager):
+    current_time = datetime.now().timestamp()
+    lowest = min(manager._retention_score(m, current_time) for m in manager.memories)
+    found = manager._retention_score(manager._lowest_retention(current_time), current_time)
+    assert found == lowest, f"evicting a memory scored {found}, the lowest score is {lowest}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--capacity', type=int, default=100000)
+    parser.add_argument('--inserts', type=int, default=10000)
+    parser.add_argument('--baseline-inserts', type=int, default=20,
+                        help="inserts timed for the (slow) full-sort eviction")
+    parser.add_argument('--importance-levels', type=int, default=0)
+    parser.add_argument('--verify', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        incremental = run(IntelligentMemoryManager, storage_dir, args.capacity, args.inserts,
+                          args.importance_levels, args.verify)
+    with tempfile.TemporaryDirectory() as storage_dir:
+        full_sort = run(FullSortMemoryManager, storage_dir, args.capacity, args.baseline_inserts,
+                        args.importance_levels)
+
+    print(f"capacity {args.capacity}, importance levels {args.importance_levels or 'continuous'}")
+    print(f"{'full sort (us/insert)':>22} {'incremental (us/insert)':>24}")
+    print(f"{full_sort:>22.1f} {incremental:>24.1f}")
+    if args.verify:
+        print("every eviction picked a memory with the lowest retention score")
+
+
+if __name__ == '__main__':
+    main()
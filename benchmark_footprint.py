@@ -0,0 +1,126 @@
+"""Bytes per memory of the memory records, before and after slotting and string sharing.
+
+Usage:
+    python benchmark_footprint.py [--memories 100000] [--related 5] [--tags 5]
+
+For each record class, "before" rebuilds the records as plain dataclasses
+(one __dict__ each) from decoded JSON, the way they were loaded previously:
+every context, tag and related content is its own string. "after" uses the
+current classes: MemoryManager and PersistentMemoryManager records as created,
+and IntelligentMemoryManager records as loaded from a saved store. Sizes are
+deep sizes of the records list, counting every shared object once, so the
+content strings themselves are included. Embeddings are excluded: they are
+the same float32 rows in both cases.
+"""
+import argparse
+import json
+import random
+import sys
+import tempfile
+from dataclasses import fields, make_dataclass
+
+import numpy as np
+
+from benchmark_utils import HashEmbeddingModel, random_sentence, synthetic_memories
+from intelligent_memory import IntelligentMemory, IntelligentMemoryManager
+from memory_manager import Memory
+from persistent_memory import PersistentMemory
+
+
+def plain_dataclass(cls):
+    """cls without slots: the record layout before this change."""
+    return make_dataclass(f'Plain{cls.__name__}', [(f.name, f.type, f) for f in fields(cls)])
+
+
+def deep_size(root) -> int:
+    """Bytes held by root and everything it references, each object counted once; arrays are skipped."""
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, np.ndarray):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif hasattr(obj, '__dataclass_fields__'):
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            else:
+                stack.extend(getattr(obj, name) for name in obj.__slots__)
+    return total
+
+
+def decoded(records, exclude=('embedding',)):
+    """Field dicts of records after a JSON round trip, as read back from disk."""
+    return json.loads(json.dumps([{f.name: getattr(r, f.name) for f in fields(r) if f.name not in exclude}
+                                  for r in records]))
+
+
+def memory_records(count, rng):
+    contexts = ["technical", "project", "personal", "learning"]
+    return [Memory(random_sentence(rng, 12), float(i), rng.random(), rng.choice(contexts), 'archival', i)
+            for i in range(count)]
+
+
+def persistent_records(count, rng):
+    contexts = ["technical", "project", "personal", "learning"]
+    return [PersistentMemory(random_sentence(rng, 12), float(i), rng.random(), rng.choice(contexts), 'archival',
+                             f"session-{i // 1000}", i)
+            for i in range(count)]
+
+
+def intelligent_records(count, related, tags, rng):
+    memories = synthetic_memories(HashEmbeddingModel(), count)
+    for i, memory in enumerate(memories):
+        memory.memory_id = i
+        memory.related_memories = [memories[j].content for j in rng.sample(range(max(i, 1)), min(i, related))]
+        memory.tags = memory.content.split()[:tags]
+    return memories
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--memories', type=int, default=100000)
+    parser.add_argument('--related', type=int, default=5)
+    parser.add_argument('--tags', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(0)
+    count = args.memories
+
+    results = {}
+    memories = memory_records(count, rng)
+    plain = plain_dataclass(Memory)
+    results['Memory'] = (deep_size([plain(**d) for d in decoded(memories)]), deep_size(memories))
+
+    memories = persistent_records(count, rng)
+    plain = plain_dataclass(PersistentMemory)
+    after = [PersistentMemory.from_dict(d) for d in decoded(memories)]
+    results['PersistentMemory'] = (deep_size([plain(**d) for d in decoded(memories)]), deep_size(after))
+
+    memories = intelligent_records(count, args.related, args.tags, rng)
+    plain = plain_dataclass(IntelligentMemory)
+    before = deep_size([plain(**d) for d in decoded(memories)])
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = IntelligentMemoryManager(storage_dir=storage_dir, model=HashEmbeddingModel(), fsync='never')
+        manager.memories = memories
+        manager._reindex()
+        manager.save_memories()
+        loaded = IntelligentMemoryManager(storage_dir=storage_dir, model=HashEmbeddingModel(), fsync='never')
+        assert [m.content for m in loaded.memories] == [m.content for m in memories]
+        assert all(a.related_memories == b.related_memories for a, b in zip(loaded.memories, memories))
+        results['IntelligentMemory'] = (before, deep_size(loaded.memories))
+
+    print(f"{count} memories, embeddings excluded")
+    print(f"{'record':>18} {'before (B/memory)':>18} {'after (B/memory)':>17} {'saved':>7}")
+    for name, (before, after) in results.items():
+        print(f"{name:>18} {before / count:>18.0f} {after / count:>17.0f} {1 - after / before:>7.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Offline evaluation of hybrid (BM25 + semantic, reciprocal rank fusion) against dense-only retrieval.
+
+Usage:
+    python benchmark_hybrid.py [--memories 20000] [--vocabulary 2000] [--codes 200] [--copies 3] [--top-k 5]
+                               [--queries 200]
+
+The corpus is a --memories turn synthetic conversation (Zipf-distributed
+words) embedded with the offline HashEmbeddingModel. --codes error codes and product names are each planted
+in --copies memories. Exact-match queries name one code plus a few common
+words, and their relevant memories are the ones holding that code; recall@k
+is the fraction of those found in the top k. Topical queries contain common
+words only, and their overlap@k with the dense top k shows how much hybrid
+ranking changes ordinary semantic results. Latency is the mean per query,
+query embedding included.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from benchmark_utils import HashEmbeddingModel, synthetic_conversation, synthetic_queries
+from intelligent_memory import IntelligentMemory, IntelligentMemoryManager
+
+CONFIGURATIONS = {
+    'dense': {'mode': 'dense'},
+    'hybrid': {'mode': 'hybrid'},
+    'hybrid+prefilter': {'mode': 'hybrid', 'prefilter': True},
+}
+
+
+def make_corpus(model, count, vocabulary, codes, copies, rng):
+    """Return the memories and, per planted code, the ids of the memories holding it."""
+    contents = [turn.text for turn in synthetic_conversation(count, vocabulary, seed=rng.randrange(2 ** 32))]
+    planted = {}
+    names = [f"err-{i:05d}" if i % 2 else f"zephyr{i}x" for i in range(codes)]
+    for name in names:
+        rows = rng.sample(range(count), copies)
+        for row in rows:
+            words = contents[row].split()
+            words[rng.randrange(len(words))] = name
+            contents[row] = " ".join(words)
+        planted[name] = rows
+    now = datetime.now().timestamp()
+    memories = [
+        IntelligentMemory(content=content, timestamp=now - 60 * (count - i), importance=0.5, context="benchmark",
+                          memory_type='active', embedding=embedding, related_memories=[], tags=[], memory_id=i)
+        for i, (content, embedding) in enumerate(zip(contents, model.encode(contents)))
+    ]
+    return memories, {name: set(rows) for name, rows in planted.items()}
+
+
+def run(manager, queries, top_k, options):
+    """Return the ranked ids per query and the mean latency in ms."""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append([memory.memory_id for memory, _ in manager.get_relevant_memories(query, top_k, **options)])
+    return results, (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--memories', type=int, default=20000)
+    parser.add_argument('--vocabulary', type=int, default=2000)
+    parser.add_argument('--codes', type=int, default=200)
+    parser.add_argument('--copies', type=int, default=3)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    model = HashEmbeddingModel()
+    memories, planted = make_corpus(model, args.memories, args.vocabulary, args.codes, args.copies, rng)
+    codes = rng.sample(sorted(planted), min(args.queries, len(planted)))
+    context_words = synthetic_queries(len(codes), args.vocabulary, seed=args.seed + 1)
+    exact_queries = [f"{code} {words}" for code, words in zip(codes, context_words)]
+    topical_queries = synthetic_queries(args.queries, args.vocabulary, words_per_query=4, seed=args.seed + 2)
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = IntelligentMemoryManager(storage_dir=storage_dir, model=model, fsync='never')
+        manager.memory_capacity = len(memories)
+        manager.memories = memories
+        manager._reindex()
+        manager.get_relevant_memories(exact_queries[0], mode='hybrid')  # Build the keyword index untimed
+        model.encode(exact_queries + topical_queries)  # Warm the word vectors
+
+        dense_topical, _ = run(manager, topical_queries, args.top_k, CONFIGURATIONS['dense'])
+        print(f"{args.memories} memories, {len(exact_queries)} exact-match and {len(topical_queries)} topical queries")
+        print(f"{'configuration':>18} {f'recall@{args.top_k}':>10} {'exact ms':>9} "
+              f"{f'overlap@{args.top_k}':>11} {'topical ms':>11}")
+        for name, options in CONFIGURATIONS.items():
+            exact, exact_ms = run(manager, exact_queries, args.top_k, options)
+            recall = sum(len(planted[code] & set(ids)) / len(planted[code])
+                         for code, ids in zip(codes, exact)) / len(codes)
+            topical, topical_ms = run(manager, topical_queries, args.top_k, options)
+            overlap = sum(len(set(a) & set(b)) for a, b in zip(topical, dense_topical)) / (
+                args.top_k * len(topical_queries))
+            print(f"{name:>18} {recall:>10.3f} {exact_ms:>9.2f} {overlap:>11.3f} {topical_ms:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
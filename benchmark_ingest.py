@@ -0,0 +1,71 @@
+"""Benchmark transcript ingest: add_memory per line vs batched add_memories.
+
+Usage:
+    python benchmark_ingest.py [--lines 50000] [--batch-size 64] [--sentence-transformer]
+    python benchmark_ingest.py --transcript chat.txt
+
+By default the offline HashEmbeddingModel stands in for the sentence
+transformer; --sentence-transformer uses all-MiniLM-L6-v2 on CPU, which is
+where batched encoding pays off most. Each run also reports the time per line
+spent in every ingest stage (IntelligentMemoryManager.stage_seconds).
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from benchmark_utils import HashEmbeddingModel, random_sentence
+from intelligent_memory import INGEST_STAGES, IntelligentMemoryManager
+
+
+def synthetic_transcript(lines, seed=0):
+    rng = random.Random(seed)
+    return [f"User: {random_sentence(rng, 8)} | Assistant: {random_sentence(rng, 12)}" for _ in range(lines)]
+
+
+def ingest(model, lines, batch_size=None):
+    """Return lines/second and stage_seconds for ingesting lines one by one (batch_size=None) or in bulk."""
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = IntelligentMemoryManager(storage_dir=storage_dir, model=model)
+        manager.memory_capacity = len(lines)
+        start = time.perf_counter()
+        if batch_size is None:
+            for line in lines:
+                manager.add_memory(line, "conversation")
+        else:
+            manager.add_memories(((line, "conversation") for line in lines), batch_size=batch_size)
+        return len(lines) / (time.perf_counter() - start), manager.stage_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=50000)
+    parser.add_argument('--transcript', help="ingest this file (one memory per line) instead of a synthetic one")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--sentence-transformer', action='store_true')
+    args = parser.parse_args()
+
+    if args.transcript:
+        with open(args.transcript) as f:
+            lines = [line.strip() for line in f if line.strip()][:args.lines]
+    else:
+        lines = synthetic_transcript(args.lines)
+
+    if args.sentence_transformer:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+    else:
+        model = HashEmbeddingModel()
+
+    per_item, per_item_stages = ingest(model, lines)
+    bulk, bulk_stages = ingest(model, lines, args.batch_size)
+    print(f"{len(lines)} lines: add_memory {per_item:.1f} lines/s, "
+          f"add_memories(batch_size={args.batch_size}) {bulk:.1f} lines/s ({bulk / per_item:.1f}x)")
+    print(f"{'stage':>8} {'add_memory (us/line)':>21} {'add_memories (us/line)':>23}")
+    for stage in INGEST_STAGES:
+        print(f"{stage:>8} {per_item_stages[stage] / len(lines) * 1e6:>21.1f} "
+              f"{bulk_stages[stage] / len(lines) * 1e6:>23.1f}")
+
+
+if __name__ == '__main__':
+    main()
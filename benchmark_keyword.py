@@ -0,0 +1,50 @@
+"""Benchmark MemoryManager keyword retrieval: full rescan vs inverted index.
+
+Usage:
+    python benchmark_keyword.py [--sizes 1000 10000 100000] [--queries 50]
+"""
+import argparse
+import random
+
+from benchmark_utils import WORDS, random_sentence, time_call
+from memory_manager import MemoryManager
+
+
+def rescan(manager, query, top_k=3):
+    """The previous retrieval: tokenize every memory on every query."""
+    scored_memories = [
+        (memory, len(set(query.lower().split()) & set(memory.content.lower().split())))
+        for memory in manager.iter_memories()
+    ]
+    scored_memories.sort(key=lambda x: (-x[1], -x[0].importance))
+    return [memory for memory, _ in scored_memories[:top_k]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'memories':>10} {'rescan (ms)':>12} {'overlap (ms)':>13} {'bm25 (ms)':>10}")
+    for size in args.sizes:
+        manager = MemoryManager(core_memory_size=size // 10, recent_memory_size=size // 10)
+        for _ in range(size):
+            # Rare words keep postings short, as in real conversation logs
+            content = f"{random_sentence(rng)} {rng.choice(WORDS)}{rng.randrange(size)}"
+            manager.add_memory(content, rng.random(), "general")
+        queries = [f"{rng.choice(WORDS)}{rng.randrange(size)} {rng.choice(WORDS)}" for _ in range(args.queries)]
+
+        for query in queries:
+            assert manager.get_relevant_memories(query) == rescan(manager, query)
+        timings = [
+            time_call(lambda: [rescan(manager, q) for q in queries]),
+            time_call(lambda: [manager.get_relevant_memories(q) for q in queries]),
+            time_call(lambda: [manager.get_relevant_memories(q, ranker='bm25') for q in queries]),
+        ]
+        print(f"{size:>10}" + ''.join(f" {t / len(queries) * 1000:>{w}.3f}" for t, w in zip(timings, (12, 13, 10))))
+
+
+if __name__ == '__main__':
+    main()
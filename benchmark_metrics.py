@@ -0,0 +1,98 @@
+"""Measure the overhead of manager instrumentation: disabled (NULL_METRICS), enabled, and sampled profiling.
+
+Usage:
+    python benchmark_metrics.py [--adds 5000] [--queries 500] [--repeat 3] [--profile-rate 0.01] [--prometheus]
+
+Each configuration times the same adds, then the same queries (keyword
+queries for MemoryManager and PersistentMemoryManager, semantic ones for
+IntelligentMemoryManager with the offline HashEmbeddingModel), and reports
+the best of --repeat runs. --prometheus prints the exposition of an
+instrumented IntelligentMemoryManager run.
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from benchmark_utils import HashEmbeddingModel, random_sentence
+from intelligent_memory import IntelligentMemoryManager
+from memory_manager import MemoryManager
+from metrics import Metrics
+from persistent_memory import PersistentMemoryManager
+
+CONFIGURATIONS = {
+    'disabled': lambda profile_rate: None,
+    'enabled': lambda profile_rate: Metrics(),
+    'profiled': lambda profile_rate: Metrics(profile_rate=profile_rate),
+}
+
+
+def make_memory(storage_dir, metrics):
+    return MemoryManager(core_memory_size=50, recent_memory_size=100, metrics=metrics)
+
+
+def make_persistent(storage_dir, metrics):
+    return PersistentMemoryManager(storage_dir, fsync='never', metrics=metrics)
+
+
+def make_intelligent(storage_dir, metrics):
+    manager = IntelligentMemoryManager(storage_dir=storage_dir, model=HashEmbeddingModel(), fsync='never',
+                                       metrics=metrics)
+    manager.memory_capacity = 500
+    return manager
+
+
+MANAGERS = {
+    'MemoryManager': make_memory,
+    'PersistentMemoryManager': make_persistent,
+    'IntelligentMemoryManager': make_intelligent,
+}
+
+
+def run(make, metrics, adds, queries, seed=0):
+    """Return microseconds per add and per query."""
+    rng = random.Random(seed)
+    texts = [random_sentence(rng, 8) for _ in range(adds)]
+    query_texts = [random_sentence(rng, 3) for _ in range(queries)]
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = make(storage_dir, metrics)
+        start = time.perf_counter()
+        if isinstance(manager, IntelligentMemoryManager):
+            for text in texts:
+                manager.add_memories([(text, "benchmark")])
+        else:
+            for text in texts:
+                manager.add_memory(text, rng.random(), "benchmark")
+        added = time.perf_counter()
+        for text in query_texts:
+            manager.get_relevant_memories(text)
+        queried = time.perf_counter()
+        return (added - start) / adds * 1e6, (queried - added) / queries * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--adds', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--profile-rate', type=float, default=0.01)
+    parser.add_argument('--prometheus', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'manager':>26} {'operation':>9} " + ' '.join(f"{name + ' (us/op)':>18}" for name in CONFIGURATIONS))
+    for name, make in MANAGERS.items():
+        best = {configuration: (float('inf'), float('inf')) for configuration in CONFIGURATIONS}
+        for _ in range(args.repeat):
+            for configuration, metrics_for in CONFIGURATIONS.items():
+                timings = run(make, metrics_for(args.profile_rate), args.adds, args.queries)
+                best[configuration] = tuple(map(min, best[configuration], timings))
+        for i, operation in enumerate(('add', 'query')):
+            print(f"{name:>26} {operation:>9} " + ' '.join(f"{best[c][i]:>18.2f}" for c in CONFIGURATIONS))
+    if args.prometheus:
+        metrics = Metrics()
+        run(make_intelligent, metrics, args.adds, args.queries)
+        print(metrics.to_prometheus(), end='')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Stress a PersistentMemoryManager store shared by several processes.
+
+Usage:
+    python benchmark_multiprocess.py [--processes 1 4 8] [--adds 500] [--backends json sqlite]
+
+For each backend, every process opens the same storage_dir and adds its share
+of memories (with the JSON backend, compactions happen along the way). A
+reader process in the same directory polls get_session_memories and must see
+the other processes' writes without calling load_memories. Afterwards the run
+fails loudly if a fresh manager does not see every memory exactly once, with
+unique memory ids and at most ten memories in the recent tier.
+"""
+import argparse
+import multiprocessing
+import random
+import tempfile
+import time
+
+from benchmark_utils import random_sentence
+from persistent_memory import BACKENDS, create_memory_manager
+
+
+def open_store(backend, storage_dir):
+    if backend == 'json':
+        return create_memory_manager(backend, storage_dir=storage_dir, compact_threshold=200)
+    return create_memory_manager(backend, storage_dir=storage_dir)
+
+
+def writer(backend, storage_dir, process_id, adds):
+    rng = random.Random(process_id)
+    manager = open_store(backend, storage_dir)
+    for i in range(adds):
+        manager.add_memory(f"process {process_id} add {i} {random_sentence(rng, 6)}", rng.random(), "stress")
+        if rng.random() < 0.01:
+            manager.get_relevant_memories(random_sentence(rng, 3))
+
+
+def reader(backend, storage_dir, expected, seen_counts):
+    """Poll until every memory is visible; records how many memories each poll saw."""
+    manager = open_store(backend, storage_dir)
+    deadline = time.monotonic() + 120
+    while time.monotonic() < deadline:
+        seen = len(manager.get_session_memories())
+        seen_counts.append(seen)
+        if seen == expected:
+            return
+        time.sleep(0.01)
+
+
+def stress(backend, processes, adds):
+    """Return adds/second across all processes; raises AssertionError on a lost or duplicated add."""
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as storage_dir:
+        open_store(backend, storage_dir)  # Create the store before the reader opens it
+        seen_counts = context.Manager().list()
+        watcher = context.Process(target=reader, args=(backend, storage_dir, processes * adds, seen_counts))
+        watcher.start()
+        writers = [
+            context.Process(target=writer, args=(backend, storage_dir, i, adds))
+            for i in range(processes)
+        ]
+        start = time.perf_counter()
+        for process in writers:
+            process.start()
+        for process in writers:
+            process.join()
+        elapsed = time.perf_counter() - start
+        watcher.join()
+        assert all(process.exitcode == 0 for process in writers + [watcher]), "a process failed"
+
+        store = open_store(backend, storage_dir)
+        memories = store.get_session_memories()
+        contents = sorted(m.content for m in memories)
+        expected = sorted(f"process {p} add {i}" for p in range(processes) for i in range(adds))
+        assert [' '.join(c.split()[:4]) for c in contents] == expected, \
+            f"{len(memories)} memories for {processes * adds} adds"
+        assert len({m.memory_id for m in memories}) == len(memories), "duplicate memory ids"
+        assert len(store.recent_memories) <= 10, "recent tier overflowed"
+        assert seen_counts and seen_counts[-1] == processes * adds, "reader missed writes"
+        return processes * adds / elapsed, len(set(seen_counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--adds', type=int, default=500, help="adds per process")
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+
+    print(f"{'backend':>8} {'processes':>10} {'adds/s':>10} {'reader polls with new data':>28}")
+    for backend in args.backends:
+        for processes in args.processes:
+            rate, refreshes = stress(backend, processes, args.adds)
+            print(f"{backend:>8} {processes:>10} {rate:>10.0f} {refreshes:>28}")
+    print("no lost or duplicated adds, the reader saw every write")
+
+
+if __name__ == '__main__':
+    main()
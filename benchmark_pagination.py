@@ -0,0 +1,110 @@
+"""Time "last 5 memories" and "page 3 of a session" through the list APIs and the paginated iterators.
+
+Usage:
+    python benchmark_pagination.py [--memories 100000] [--sessions 20] [--page-size 20] [--backends json sqlite]
+
+The store gets --memories memories spread over --sessions sessions and four
+contexts. Before timing, the run fails loudly unless every iter_memories
+page (offsets, limits, reverse, session and context filters) equals the
+matching slice of the list APIs, and unless the iter_chronological pages,
+followed by cursor in both directions, visit every memory once in
+(timestamp, memory_id) order.
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from benchmark_utils import random_sentence
+from persistent_memory import BACKENDS, create_memory_manager
+
+CONTEXTS = ("technical", "project", "personal", "learning")
+
+
+def fill(manager, memories, sessions, seed=0):
+    rng = random.Random(seed)
+    with manager.deferred():
+        for i in range(memories):
+            manager.current_session_id = f"session-{i * sessions // memories}"
+            manager.add_memory(random_sentence(rng, 8), rng.random(), rng.choice(CONTEXTS))
+
+
+def follow_cursor(manager, page_size, reverse, **filters):
+    memories, cursor = [], None
+    while True:
+        page = list(manager.iter_chronological(cursor=cursor, limit=page_size, reverse=reverse, **filters))
+        if not page:
+            return memories
+        memories += page
+        cursor = page[-1]
+
+
+def check(manager, sessions, page_size):
+    key = lambda m: (m.timestamp, m.memory_id)
+    filters = [{}, {'session_id': 'session-1'}, {'context': 'Project'},
+               {'session_id': f'session-{sessions - 1}', 'context': 'learning'}]
+    for f in filters:
+        expected = [m for m in manager.get_session_memories(f.get('session_id'))
+                    if 'context' not in f or m.context.lower() == f['context'].lower()]
+        for offset in (0, 1, 7, len(expected) - 3, len(expected) + 5):
+            for limit in (None, 1, page_size):
+                page = [m.memory_id for m in manager.iter_memories(offset=offset, limit=limit, **f)]
+                stop = None if limit is None else offset + limit
+                assert page == [m.memory_id for m in expected[offset:stop]], (f, offset, limit)
+                page = [m.memory_id for m in manager.iter_memories(offset=offset, limit=limit, reverse=True, **f)]
+                assert page == [m.memory_id for m in expected[::-1][offset:stop]], (f, offset, limit, 'reverse')
+        chronological = sorted(expected, key=key)
+        assert [m.memory_id for m in follow_cursor(manager, page_size, False, **f)] == \
+            [m.memory_id for m in chronological], f
+        assert [m.memory_id for m in follow_cursor(manager, page_size, True, **f)] == \
+            [m.memory_id for m in chronological[::-1]], f
+    assert [m.memory_id for m in manager.get_memories_by_context('project')] == \
+        [m.memory_id for m in manager.iter_memories(context='project')]
+
+
+def best_us(func, repeat=20):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--memories', type=int, default=100000)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    args = parser.parse_args()
+    size = args.page_size
+
+    print(f"{'backend':>8} {'operation':>22} {'list API (us)':>14} {'iterator (us)':>14}")
+    for backend in args.backends:
+        with tempfile.TemporaryDirectory() as storage_dir:
+            manager = create_memory_manager(backend, storage_dir=storage_dir)
+            fill(manager, args.memories, args.sessions)
+            check(manager, args.sessions, size)
+            session = 'session-1'
+            timings = {
+                'last 5 memories': (
+                    lambda: manager.get_session_memories()[-5:],
+                    lambda: list(manager.iter_memories(limit=5, reverse=True))[::-1]),
+                'page 3 of a session': (
+                    lambda: manager.get_session_memories(session)[2 * size:3 * size],
+                    lambda: list(manager.iter_memories(session, offset=2 * size, limit=size))),
+                'newest page': (
+                    lambda: sorted(manager.get_session_memories(), key=lambda m: -m.timestamp)[:size],
+                    lambda: list(manager.iter_chronological(limit=size, reverse=True))),
+            }
+            for operation, (from_list, from_iterator) in timings.items():
+                assert [m.memory_id for m in from_list()] == [m.memory_id for m in from_iterator()], operation
+                print(f"{backend:>8} {operation:>22} {best_us(from_list):>14.1f} {best_us(from_iterator):>14.1f}")
+            if hasattr(manager, 'close'):
+                manager.close()
+    print("every page matched the list APIs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Benchmark per-write persistence cost: full JSON rewrite vs append-only log vs SQLite.
+
+Usage:
+    python benchmark_persistence.py [--sizes 1000 5000 20000] [--fsync interval]
+"""
+import argparse
+import tempfile
+import time
+
+from persistent_memory import PersistentMemoryManager
+from sqlite_memory import SQLiteMemoryManager
+
+
+class RewritingMemoryManager(PersistentMemoryManager):
+    """The previous behaviour: rewrite memories.json after every add."""
+
+    def _maybe_compact(self):
+        self.save_memories()
+
+
+def ingest(manager_type, size, fsync, window=200):
+    """Fill a store to size and return the mean add latency (ms) over the last window adds."""
+    with tempfile.TemporaryDirectory() as storage_dir:
+        filler = PersistentMemoryManager(storage_dir, fsync='never')
+        for i in range(size - window):
+            filler.add_memory(f"User said something about topic {i}", 0.6 if i % 5 else 0.9, "general")
+        filler.save_memories()
+
+        manager = manager_type(storage_dir, fsync=fsync)
+        start = time.perf_counter()
+        for i in range(window):
+            manager.add_memory(f"User said something about topic {i}", 0.6, "general")
+        return (time.perf_counter() - start) / window * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--fsync', default='interval', choices=['always', 'interval', 'never'])
+    args = parser.parse_args()
+
+    print(f"{'memories':>10} {'rewrite (ms/add)':>18} {'log (ms/add)':>14} {'sqlite (ms/add)':>17}")
+    for size in args.sizes:
+        rewrite = ingest(RewritingMemoryManager, size, args.fsync)
+        log = ingest(PersistentMemoryManager, size, args.fsync)
+        sqlite = ingest(SQLiteMemoryManager, size, args.fsync)
+        print(f"{size:>10} {rewrite:>18.3f} {log:>14.3f} {sqlite:>17.3f}")
+
+
+if __name__ == '__main__':
+    main()
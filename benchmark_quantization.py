@@ -0,0 +1,115 @@
+"""Measure quantized (float16, int8) embedding storage against float32: top-k overlap, memory, disk and speed.
+
+Usage:
+    python benchmark_quantization.py [--memories 100000] [--queries 200] [--top-k 10] [--rescore 4]
+
+The corpus is a --memories turn synthetic conversation embedded with the
+offline HashEmbeddingModel (384 dimensions, as all-MiniLM-L6-v2). Index rows
+compare FlatIndex at each precision: bytes of vectors in RAM, size of the
+saved index, mean ms per query and overlap@k with the float32 top k.
+Manager rows compare get_relevant_memories with and without exact re-scoring
+of the top --rescore * k candidates, and the Python heap of a manager
+reloaded from disk (traced by tracemalloc, after one add so the memory-mapped
+index is copied into RAM). The run fails loudly if re-scoring loses more than
+1% overlap@k.
+"""
+import argparse
+import dataclasses
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from benchmark_utils import HashEmbeddingModel, directory_size, synthetic_conversation, synthetic_queries, time_call
+from intelligent_memory import IntelligentMemory, IntelligentMemoryManager
+from vector_index import PRECISIONS, FlatIndex
+
+
+def make_memories(model, count, seed=0):
+    contents = [turn.text for turn in synthetic_conversation(count, seed=seed)]
+    now = datetime.now().timestamp()
+    return [
+        IntelligentMemory(content=content, timestamp=now - 60 * (count - i), importance=0.5, context="benchmark",
+                          memory_type='active', embedding=embedding, related_memories=[], tags=[], memory_id=i)
+        for i, (content, embedding) in enumerate(zip(contents, model.encode(contents)))
+    ]
+
+
+def overlap(results, reference, k):
+    return np.mean([len(set(a) & set(b)) / k for a, b in zip(results, reference)])
+
+
+def compare_indexes(memories, queries, k):
+    print(f"{'index':>8} {'vector MB':>10} {'disk MB':>8} {'ms/query':>9} {f'overlap@{k}':>11}")
+    reference = None
+    for precision in PRECISIONS:
+        index = FlatIndex(precision=precision)
+        for memory in memories:
+            index.add(memory.memory_id, memory.embedding)
+        results = [index.search(q, k)[0].tolist() for q in queries]
+        reference = reference or results
+        ms = time_call(lambda: [index.search(q, k) for q in queries], repeat=3) / len(queries) * 1e3
+        with tempfile.TemporaryDirectory() as storage_dir:
+            index.save(storage_dir)
+            disk = directory_size(storage_dir)
+        print(f"{precision:>8} {index.nbytes / 2 ** 20:>10.1f} {disk / 2 ** 20:>8.1f} {ms:>9.3f} "
+              f"{overlap(results, reference, k):>11.3f}")
+
+
+def heap_after_reload(storage_dir, model, precision):
+    tracemalloc.start()
+    manager = IntelligentMemoryManager(storage_dir=storage_dir, model=model, fsync='never',
+                                       embedding_precision=precision)
+    manager.memory_capacity = len(manager.memories) + 1
+    manager.add_memory("one more memory", "benchmark")
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return heap
+
+
+def compare_managers(model, memories, queries, k, rescore):
+    print(f"\n{'manager':>16} {'heap MB':>8} {'ms/query':>9} {f'overlap@{k}':>11}")
+    reference = None
+    for precision in PRECISIONS:
+        with tempfile.TemporaryDirectory() as storage_dir:
+            manager = IntelligentMemoryManager(storage_dir=storage_dir, model=model, fsync='never',
+                                               embedding_precision=precision)
+            manager.memory_capacity = len(memories) + 1
+            manager.memories = [dataclasses.replace(memory) for memory in memories]
+            manager._reindex()
+            manager.save_memories()
+            heap = heap_after_reload(storage_dir, model, precision)
+            for setting in ((rescore, 0) if precision != 'float32' else (0,)):
+                manager.rescore = setting
+                start = time.perf_counter()
+                results = [[m.memory_id for m, _ in manager.get_relevant_memories(query, k)] for query in queries]
+                ms = (time.perf_counter() - start) / len(queries) * 1e3
+                reference = reference or results
+                score = overlap(results, reference, k)
+                name = precision + (f' rescore {setting}' if setting else '')
+                print(f"{name:>16} {heap / 2 ** 20:>8.1f} {ms:>9.3f} {score:>11.3f}")
+                if setting:
+                    assert score >= 0.99, f"{name} overlap@{k} {score:.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--memories', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--rescore', type=int, default=4)
+    args = parser.parse_args()
+
+    model = HashEmbeddingModel()
+    memories = make_memories(model, args.memories)
+    queries = synthetic_queries(args.queries, words_per_query=4)
+    model.encode(queries)  # Warm the word vectors
+    print(f"{args.memories} memories, {args.queries} queries, {model.dim} dimensions\n")
+    compare_indexes(memories, model.encode(queries), args.top_k)
+    compare_managers(model, memories, queries, args.top_k, args.rescore)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark semantic retrieval: per-memory cosine_similarity loop vs embedding matrix.
+
+Usage:
+    python benchmark_retrieval.py [--sizes 1000 10000 100000]
+"""
+import argparse
+import random
+import tempfile
+from datetime import datetime
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+from benchmark_utils import HashEmbeddingModel, random_sentence, synthetic_memories, time_call
+from intelligent_memory import IntelligentMemoryManager
+
+
+def legacy_get_relevant_memories(manager, query, top_k=5):
+    """The original per-memory retrieval loop, kept here as the baseline."""
+    query_embedding = manager._generate_embedding(query)
+    relevant_memories = []
+    current_time = datetime.now().timestamp()
+    for memory in manager.memories:
+        if memory.embedding is not None:
+            similarity = cosine_similarity([query_embedding], [memory.embedding])[0][0]
+            recency = 1 / (current_time - memory.timestamp + 1)
+            relevance = 0.7 * similarity + 0.3 * recency
+            relevant_memories.append((memory, relevance))
+    relevant_memories.sort(key=lambda x: x[1], reverse=True)
+    return relevant_memories[:top_k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    model = HashEmbeddingModel()
+    query = random_sentence(random.Random(42), length=4)
+
+    print(f"{'memories':>10} {'loop (ms)':>12} {'matrix (ms)':>12} {'speedup':>9}  same top-k")
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = IntelligentMemoryManager(storage_dir=storage_dir, model=model)
+        for size in args.sizes:
+            manager.memories = synthetic_memories(model, size)
+            manager._reindex()
+
+            legacy = legacy_get_relevant_memories(manager, query, args.top_k)
+            current = manager.get_relevant_memories(query, args.top_k)
+            same = [m.content for m, _ in legacy] == [m.content for m, _ in current]
+
+            loop_time = time_call(lambda: legacy_get_relevant_memories(manager, query, args.top_k),
+                                  repeat=1 if size >= 100000 else 3)
+            matrix_time = time_call(lambda: manager.get_relevant_memories(query, args.top_k))
+            print(f"{size:>10} {loop_time * 1000:>12.2f} {matrix_time * 1000:>12.2f} "
+                  f"{loop_time / matrix_time:>8.1f}x  {same}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark time-to-first-prompt of IntelligentMemoryManager: eager vs lazy initialization.
+
+Each measurement runs in a fresh interpreter so import caches do not carry over.
+"Import" is the cumulative time of ``import intelligent_memory`` reported by
+``python -X importtime``; "ready" is wall time from interpreter start until the
+manager is constructed and could take its first prompt.
+
+Usage:
+    python benchmark_startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+from intelligent_memory import IntelligentMemoryManager
+IntelligentMemoryManager(storage_dir={storage_dir!r}, lazy={lazy})
+print(time.perf_counter() - start)
+"""
+
+
+def run_python(args, cwd):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [HERE, os.environ.get('PYTHONPATH')])))
+    return subprocess.run([sys.executable] + args, cwd=cwd, env=env, capture_output=True, text=True)
+
+
+def import_time(cwd):
+    """Cumulative seconds spent importing intelligent_memory, from -X importtime."""
+    result = run_python(['-X', 'importtime', '-c', 'import intelligent_memory'], cwd)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == 'intelligent_memory':
+            return int(parts[1]) / 1e6
+    raise RuntimeError("intelligent_memory missing from -X importtime output")
+
+
+def ready_time(cwd, lazy):
+    """Seconds from interpreter start of the script to a constructed manager."""
+    with tempfile.TemporaryDirectory() as storage_dir:
+        result = run_python(['-c', STARTUP_SCRIPT.format(storage_dir=storage_dir, lazy=lazy)], cwd)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cwd:
+        imports = [import_time(cwd) for _ in range(args.runs)]
+        print(f"import intelligent_memory: {statistics.median(imports) * 1000:.1f} ms (median of {args.runs})")
+
+        print(f"{'mode':>6} {'ready (s)':>10}")
+        for lazy in (False, True):
+            mode = 'lazy' if lazy else 'eager'
+            try:
+                times = [ready_time(cwd, lazy) for _ in range(args.runs)]
+            except RuntimeError as e:
+                print(f"{mode:>6} {'failed':>10}  ({e})")
+                continue
+            print(f"{mode:>6} {statistics.median(times):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Benchmark IntelligentMemoryManager snapshot save/load: legacy JSON vs memory-mapped arrays.
+
+Usage:
+    python benchmark_storage.py [--sizes 10000 100000] [--legacy-max 20000]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmark_utils import HashEmbeddingModel, synthetic_memories
+from intelligent_memory import IntelligentMemoryManager
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def measure(model, memories, legacy):
+    """Return (save seconds, load seconds, bytes on disk) for one storage format."""
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = IntelligentMemoryManager(storage_dir=storage_dir, model=model)
+        manager.memories = memories
+        manager._reindex()
+
+        start = time.perf_counter()
+        if legacy:
+            with open(os.path.join(storage_dir, 'memories.json'), 'w') as f:
+                json.dump([m.to_dict() for m in memories], f, indent=2)
+        else:
+            manager.save_memories()
+        save_time = time.perf_counter() - start
+        size = directory_size(storage_dir)
+
+        start = time.perf_counter()
+        if legacy:
+            # The load path of earlier versions, without the one-off migration to the new format
+            with open(os.path.join(storage_dir, 'memories.json'), 'r') as f:
+                memory_data = json.load(f)
+            manager.memories = [type(memories[0]).from_dict(m) for m in memory_data]
+            manager._reindex()
+        else:
+            IntelligentMemoryManager(storage_dir=storage_dir, model=model)
+        load_time = time.perf_counter() - start
+        return save_time, load_time, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--legacy-max', type=int, default=20000,
+                        help="skip the (slow) legacy JSON format above this many memories")
+    args = parser.parse_args()
+
+    model = HashEmbeddingModel()
+    print(f"{'memories':>10} {'format':>8} {'save (s)':>10} {'load (s)':>10} {'disk (MB)':>10}")
+    for size in args.sizes:
+        memories = synthetic_memories(model, size)
+        for legacy in (True, False):
+            if legacy and size > args.legacy_max:
+                continue
+            save_time, load_time, disk = measure(model, memories, legacy)
+            print(f"{size:>10} {'json' if legacy else 'mmap':>8} {save_time:>10.3f} {load_time:>10.3f} {disk / 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
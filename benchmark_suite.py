@@ -0,0 +1,262 @@
+"""Reproducible benchmark suite: synthetic conversations driven through every memory manager.
+
+Usage:
+    python benchmark_suite.py [--turns 5000] [--queries 500] [--vocabulary 2000] [--contexts 5]
+                              [--sessions 10] [--seed 0] [--targets ...] [--workloads ...]
+                              [--output report.json] [--sentence-transformer]
+
+Targets: memory (MemoryManager), persistent (PersistentMemoryManager), sqlite
+(its SQLite backend), intelligent (IntelligentMemoryManager) and assistant
+(PersistentAIAssistant.process_input).
+
+Workloads:
+    ingest   add every turn of the conversation, one at a time
+    query    ingest untimed, then time the queries
+    mixed    the conversation with a query after every turn (process_input for the assistant)
+    restart  ingest and save untimed, then time reopening the store and its first query (RESTARTS times)
+
+Every (target, workload) pair runs in a fresh process so that peak RSS is its
+own. The report holds throughput, p50/p99 latency, peak RSS and the size of
+the storage directory, plus the configuration, so reports can be compared
+across commits. IntelligentMemoryManager uses the offline HashEmbeddingModel
+unless --sentence-transformer is given. The assistant only has
+process_input, so its adds and queries are both process_input calls with the
+turn's user text or the query.
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import tempfile
+import time
+
+from benchmark_utils import (HashEmbeddingModel, directory_size, peak_rss_bytes, percentile,
+                             synthetic_conversation, synthetic_queries)
+
+TARGETS = ('memory', 'persistent', 'sqlite', 'intelligent', 'assistant')
+WORKLOADS = ('ingest', 'query', 'mixed', 'restart')
+RESTARTS = 5
+
+
+class Target:
+    """Uniform add / query / reopen interface over a manager or the assistant."""
+
+    persistent = True
+
+    def __init__(self, storage_dir, config):
+        self.storage_dir = storage_dir
+        self.config = config
+        self.session_id = None
+        self.open()
+
+    def open(self):
+        raise NotImplementedError
+
+    def add(self, turn):
+        raise NotImplementedError
+
+    def query(self, text):
+        raise NotImplementedError
+
+    def close(self):
+        """Persist everything so that open() in a new instance sees the whole store."""
+
+
+class MemoryTarget(Target):
+    persistent = False
+
+    def open(self):
+        from memory_manager import MemoryManager
+        self.manager = MemoryManager()
+
+    def add(self, turn):
+        self.manager.add_memory(turn.text, turn.importance, turn.context)
+
+    def query(self, text):
+        return self.manager.get_relevant_memories(text)
+
+
+class PersistentTarget(Target):
+    backend = 'json'
+
+    def open(self):
+        from persistent_memory import create_memory_manager
+        self.manager = create_memory_manager(self.backend, storage_dir=self.storage_dir)
+
+    def add(self, turn):
+        self.manager.current_session_id = turn.session_id
+        self.manager.add_memory(turn.text, turn.importance, turn.context)
+
+    def query(self, text):
+        return self.manager.get_relevant_memories(text)
+
+    def close(self):
+        self.manager.save_memories()
+        if hasattr(self.manager, 'close'):
+            self.manager.close()
+
+
+class SQLiteTarget(PersistentTarget):
+    backend = 'sqlite'
+
+
+class IntelligentTarget(Target):
+    def open(self):
+        from intelligent_memory import IntelligentMemoryManager
+        self.manager = IntelligentMemoryManager(storage_dir=self.storage_dir, model=make_model(self.config))
+
+    def add(self, turn):
+        self.manager.add_memory(turn.text, turn.context)
+
+    def query(self, text):
+        return self.manager.get_relevant_memories(text)
+
+    def close(self):
+        self.manager.save_memories()
+
+
+class AssistantTarget(Target):
+    def open(self):
+        from persistent_assistant import PersistentAIAssistant
+        self.assistant = PersistentAIAssistant(storage_dir=self.storage_dir)
+
+    def add(self, turn):
+        if turn.session_id != self.session_id:
+            self.session_id = turn.session_id
+            self.assistant.memory_manager.current_session_id = turn.session_id
+            self.assistant.start_session(turn.context)
+        self.assistant.process_input(turn.user)
+
+    def query(self, text):
+        return self.assistant.process_input(text)
+
+    def close(self):
+        self.assistant.memory_manager.save_memories()
+
+
+TARGET_CLASSES = {
+    'memory': MemoryTarget,
+    'persistent': PersistentTarget,
+    'sqlite': SQLiteTarget,
+    'intelligent': IntelligentTarget,
+    'assistant': AssistantTarget,
+}
+
+
+def make_model(config):
+    if config['sentence_transformer']:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer('all-MiniLM-L6-v2', device='cpu')
+    return HashEmbeddingModel()
+
+
+def timed_calls(func, items):
+    """Call func on every item; return (total seconds, per-call latencies in seconds)."""
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        call_start = time.perf_counter()
+        func(item)
+        latencies.append(time.perf_counter() - call_start)
+    return time.perf_counter() - start, latencies
+
+
+def run_workload(target_name, workload, config):
+    """Run one workload on a fresh target; returns its metrics, or None if it does not apply."""
+    target_class = TARGET_CLASSES[target_name]
+    if workload == 'restart' and not target_class.persistent:
+        return None
+    conversation = synthetic_conversation(
+        config['turns'], config['vocabulary'], config['contexts'], config['sessions'], seed=config['seed']
+    )
+    queries = synthetic_queries(config['queries'], config['vocabulary'], seed=config['seed'] + 1)
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        target = target_class(storage_dir, config)
+        if workload == 'ingest':
+            seconds, latencies = timed_calls(target.add, conversation)
+        elif workload == 'query':
+            for turn in conversation:
+                target.add(turn)
+            seconds, latencies = timed_calls(target.query, queries)
+        elif workload == 'mixed':
+            def turn_and_query(item):
+                turn, query = item
+                target.add(turn)
+                target.query(query)
+            pairs = [(turn, queries[i % len(queries)]) for i, turn in enumerate(conversation)]
+            seconds, latencies = timed_calls(turn_and_query, pairs)
+        else:
+            for turn in conversation:
+                target.add(turn)
+            target.close()
+
+            def reopen(query):
+                reopened = target_class(storage_dir, config)
+                reopened.query(query)
+            seconds, latencies = timed_calls(reopen, queries[:RESTARTS])
+        target.close()
+        disk_bytes = directory_size(storage_dir)
+
+    rss = peak_rss_bytes()
+    return {
+        'operations': len(latencies),
+        'seconds': seconds,
+        'throughput': len(latencies) / seconds if seconds else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1e3,
+        'p99_ms': percentile(latencies, 99) * 1e3,
+        'peak_rss_mb': rss / 2 ** 20 if rss is not None else None,
+        'disk_bytes': disk_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--vocabulary', type=int, default=2000)
+    parser.add_argument('--contexts', type=int, default=5)
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--targets', nargs='+', default=list(TARGETS), choices=TARGETS)
+    parser.add_argument('--workloads', nargs='+', default=list(WORKLOADS), choices=WORKLOADS)
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    parser.add_argument('--sentence-transformer', action='store_true')
+    args = parser.parse_args()
+
+    config = {
+        'turns': args.turns,
+        'queries': args.queries,
+        'vocabulary': args.vocabulary,
+        'contexts': args.contexts,
+        'sessions': args.sessions,
+        'seed': args.seed,
+        'sentence_transformer': args.sentence_transformer,
+    }
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for target_name in args.targets:
+            results[target_name] = {}
+            for workload in args.workloads:
+                metrics = pool.apply(run_workload, (target_name, workload, config))
+                if metrics is not None:
+                    results[target_name][workload] = metrics
+                    print(f"{target_name:>12} {workload:>8} {metrics['throughput']:>10.1f} ops/s "
+                          f"p50 {metrics['p50_ms']:>8.3f} ms  p99 {metrics['p99_ms']:>8.3f} ms", flush=True)
+
+    report = {
+        'config': config,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
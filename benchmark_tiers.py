@@ -0,0 +1,81 @@
+"""Benchmark MemoryManager insert cost as the store grows: list tiers vs heap/deque tiers.
+
+Usage:
+    python benchmark_tiers.py [--total 1000000] [--core-size 10000] [--recent-size 100000]
+"""
+import argparse
+import random
+import time
+
+from memory_manager import Memory, MemoryManager
+
+
+class ListMemoryManager:
+    """The previous tiers: plain lists with min()/remove() and pop(0)."""
+
+    def __init__(self, core_memory_size: int = 5, recent_memory_size: int = 10):
+        self.core_memories = []
+        self.recent_memories = []
+        self.archival_memories = []
+        self.core_memory_size = core_memory_size
+        self.recent_memory_size = recent_memory_size
+
+    def add_memory(self, content, importance, context):
+        memory = Memory(content, time.time(), importance, context, 'recent')
+        if importance >= 0.8:
+            if len(self.core_memories) >= self.core_memory_size:
+                least_important = min(self.core_memories, key=lambda x: x.importance)
+                self.core_memories.remove(least_important)
+                least_important.memory_type = 'recent'
+                self._add_to_recent(least_important)
+            memory.memory_type = 'core'
+            self.core_memories.append(memory)
+        else:
+            self._add_to_recent(memory)
+        return memory
+
+    def _add_to_recent(self, memory):
+        self.recent_memories.append(memory)
+        if len(self.recent_memories) > self.recent_memory_size:
+            oldest = self.recent_memories.pop(0)
+            oldest.memory_type = 'archival'
+            self.archival_memories.append(oldest)
+
+
+def insert_rates(manager, total, checkpoints, window=10000, seed=0):
+    """Insert total memories and return the mean insert time (us) of the window before each checkpoint."""
+    rng = random.Random(seed)
+    rates = {}
+    start = time.perf_counter()
+    for i in range(1, total + 1):
+        if i % window == 1:
+            start = time.perf_counter()
+        manager.add_memory(f"memory {i}", rng.random(), "general")
+        if i in checkpoints:
+            rates[i] = (time.perf_counter() - start) / window * 1e6
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--total', type=int, default=1000000)
+    parser.add_argument('--core-size', type=int, default=10000)
+    parser.add_argument('--recent-size', type=int, default=100000)
+    parser.add_argument('--list-max', type=int, default=100000,
+                        help="stop the (slow) list-based manager after this many inserts")
+    args = parser.parse_args()
+
+    checkpoints = [n for n in (10000, 100000, 200000, 500000, 1000000, 2000000) if n <= args.total]
+    heap = insert_rates(MemoryManager(args.core_size, args.recent_size), args.total, set(checkpoints))
+    lists = insert_rates(ListMemoryManager(args.core_size, args.recent_size),
+                         min(args.total, args.list_max), set(checkpoints))
+
+    print(f"core size {args.core_size}, recent size {args.recent_size}")
+    print(f"{'memories':>10} {'lists (us/insert)':>18} {'heap (us/insert)':>18}")
+    for n in checkpoints:
+        list_rate = f"{lists[n]:.2f}" if n in lists else '-'
+        print(f"{n:>10} {list_rate:>18} {heap[n]:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Shared helpers for the benchmark scripts.
+
+The benchmarks run offline: instead of downloading all-MiniLM-L6-v2 they use
+HashEmbeddingModel, a deterministic stand-in with the same ``encode`` interface.
+synthetic_conversation generates reproducible conversation corpora for
+benchmark_suite.py.
+"""
+import hashlib
+import os
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import accumulate
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from intelligent_memory import IntelligentMemory
+
+EMBEDDING_DIM = 384
+
+WORDS = (
+    "python project deadline model gpu training memory session user preference "
+    "database query latency cache index server client deploy release bug error "
+    "feature design review meeting team schedule budget report metric dashboard "
+    "learning research paper dataset benchmark pipeline docker cluster network"
+).split()
+
+
+class HashEmbeddingModel:
+    """Deterministic bag-of-words embedding model for offline benchmarks.
+
+    Each word maps to a fixed random vector seeded by its hash, and a text is
+    the sum of its word vectors, so texts that share words are similar.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self._word_vectors = {}
+
+    def _word_vector(self, word: str) -> np.ndarray:
+        vector = self._word_vectors.get(word)
+        if vector is None:
+            seed = int.from_bytes(hashlib.md5(word.encode()).digest()[:4], 'little')
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            self._word_vectors[word] = vector
+        return vector
+
+    def encode(self, texts: Sequence[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in text.lower().split():
+                embeddings[i] += self._word_vector(word)
+        return embeddings
+
+
+def random_sentence(rng: random.Random, length: int = 12) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+def synthetic_memories(model: HashEmbeddingModel, count: int, seed: int = 0) -> List[IntelligentMemory]:
+    """Build embedded memories directly, skipping the tagging and importance pipeline."""
+    rng = random.Random(seed)
+    contents = [random_sentence(rng) for _ in range(count)]
+    embeddings = model.encode(contents)
+    now = datetime.now().timestamp()
+    return [
+        IntelligentMemory(
+            content=content,
+            timestamp=now - 60 * (count - i),
+            importance=0.5 + rng.random() / 2,
+            context=rng.choice(["technical", "project", "personal", "learning"]),
+            memory_type='active',
+            embedding=embedding,
+            related_memories=[],
+            tags=[]
+        )
+        for i, (content, embedding) in enumerate(zip(contents, embeddings))
+    ]
+
+
+# Contexts the assistant and demos use, then generated ones
+CONTEXTS = ("general", "project", "technical", "learning", "personal")
+
+
+@dataclass
+class Turn:
+    user: str
+    assistant: str
+    context: str
+    session_id: str
+    importance: float
+
+    @property
+    def text(self) -> str:
+        """The turn as PersistentAIAssistant stores it."""
+        return f"User: {self.user} | Assistant: {self.assistant}"
+
+
+def make_vocabulary(size: int) -> List[str]:
+    """WORDS followed by generated words, size words in all."""
+    return list(WORDS[:size]) + [f"term{i}" for i in range(size - len(WORDS))]
+
+
+def _zipf_weights(count: int, skew: float) -> List[float]:
+    """Cumulative weights of ranks 1..count proportional to 1 / rank ** skew."""
+    return list(accumulate(1 / (rank + 1) ** skew for rank in range(count)))
+
+
+def synthetic_conversation(turns: int, vocabulary_size: int = 2000, contexts: int = 5, sessions: int = 10,
+                           words_per_turn: int = 12, word_skew: float = 1.0, context_skew: float = 1.0,
+                           seed: int = 0) -> List[Turn]:
+    """Generate a conversation of turns split into contiguous sessions.
+
+    Words and contexts follow Zipf distributions with the given skews (0 is
+    uniform), so a few words and contexts dominate as in real transcripts.
+    """
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size)
+    word_weights = _zipf_weights(len(vocabulary), word_skew)
+    context_names = list(CONTEXTS[:contexts]) + [f"context{i}" for i in range(len(CONTEXTS), contexts)]
+    context_weights = _zipf_weights(contexts, context_skew)
+    per_session = -(-turns // max(sessions, 1))
+
+    conversation = []
+    for i in range(turns):
+        words = rng.choices(vocabulary, cum_weights=word_weights, k=words_per_turn)
+        half = words_per_turn // 2
+        conversation.append(Turn(
+            user=' '.join(words[:half]),
+            assistant=' '.join(words[half:]),
+            context=rng.choices(context_names, cum_weights=context_weights)[0],
+            session_id=f"session{i // per_session:05d}",
+            importance=rng.random()
+        ))
+    return conversation
+
+
+def synthetic_queries(count: int, vocabulary_size: int = 2000, words_per_query: int = 3,
+                      word_skew: float = 1.0, seed: int = 1) -> List[str]:
+    """Queries drawn from the same word distribution as synthetic_conversation."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size)
+    word_weights = _zipf_weights(len(vocabulary), word_skew)
+    return [' '.join(rng.choices(vocabulary, cum_weights=word_weights, k=words_per_query)) for _ in range(count)]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank q-th percentile (0-100) of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(-(-q * len(ordered) // 100)) - 1))]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, or None where the resource module is missing."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024  # Linux reports KiB
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files under path."""
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+
+
+def time_call(func: Callable, repeat: int = 5) -> float:
+    """Return the best wall-clock time of func() in seconds over repeat runs."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
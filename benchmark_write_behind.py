@@ -0,0 +1,123 @@
+"""Log writes per assistant turn with per-add, per-turn and write-behind persistence, and shutdown durability.
+
+Usage:
+    python benchmark_write_behind.py [--turns 2000] [--fsync always] [--window 1.0] [--flush-every 100]
+
+Each mode drives PersistentAIAssistant.process_input over the same turns and
+reports turns/s, log flushes per turn and p99 turn latency:
+
+    per-add       every add_memory appends to memories.log (the behaviour without deferred())
+    per-turn      one append per turn (write_behind=None, the default)
+    write-behind  appends at most every --window seconds or --flush-every records
+
+Then a child process adds memories in write-behind mode with a window far
+longer than the run and ends by returning from main, by SIGTERM, or by
+os._exit. The run fails loudly unless a reopened store holds every memory
+after the first two; the os._exit case shows the memories a crash inside the
+window loses.
+"""
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+
+from benchmark_utils import percentile, random_sentence
+from metrics import Metrics
+from persistent_assistant import PersistentAIAssistant
+from persistent_memory import PersistentMemoryManager
+
+MODES = ('per-add', 'per-turn', 'write-behind')
+ENDINGS = ('return', 'sigterm', 'crash')
+
+
+def make_turns(count, seed=0):
+    rng = random.Random(seed)
+    # A third of the turns state a preference, so they store two memories
+    return [("i like " if i % 3 == 0 else "") + random_sentence(rng, 8) for i in range(count)]
+
+
+def run_mode(mode, turns, fsync, window, flush_every):
+    metrics = Metrics()
+    options = {'fsync': fsync, 'metrics': metrics}
+    if mode == 'write-behind':
+        options.update(write_behind=window, flush_every=flush_every)
+    with tempfile.TemporaryDirectory() as storage_dir:
+        assistant = PersistentAIAssistant(storage_dir=storage_dir, **options)
+        if mode == 'per-add':
+            assistant.memory_manager.deferred = lambda: nullcontext()
+        latencies = []
+        start = time.perf_counter()
+        for text in turns:
+            turn_start = time.perf_counter()
+            assistant.process_input(text)
+            latencies.append(time.perf_counter() - turn_start)
+        assistant.end_session()
+        seconds = time.perf_counter() - start
+    flushes = metrics.snapshot()['counters'].get('log_flushes_total', 0)
+    return len(turns) / seconds, flushes / len(turns), percentile(latencies, 99) * 1e3
+
+
+def count_memories(storage_dir):
+    manager = PersistentMemoryManager(storage_dir)
+    return len(manager.core_memories) + len(manager.recent_memories) + len(manager.archival_memories)
+
+
+def child(ending, storage_dir, turns):
+    """Add memories in write-behind mode, report how many, then end as requested."""
+    assistant = PersistentAIAssistant(storage_dir=storage_dir, write_behind=3600.0, flush_every=10 ** 6)
+    assistant.start_session()
+    for text in make_turns(turns):
+        assistant.process_input(text)
+    manager = assistant.memory_manager
+    print(len(manager.core_memories) + len(manager.recent_memories) + len(manager.archival_memories), flush=True)
+    if ending == 'sigterm':
+        time.sleep(60)  # The parent sends SIGTERM
+    elif ending == 'crash':
+        os._exit(1)
+
+
+def check_shutdown(ending, turns):
+    """Return (memories added, memories found after reopening)."""
+    with tempfile.TemporaryDirectory() as storage_dir:
+        process = subprocess.Popen([sys.executable, __file__, '--child', ending, storage_dir, str(turns)],
+                                   stdout=subprocess.PIPE, text=True)
+        added = int(process.stdout.readline())
+        if ending == 'sigterm':
+            process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+        return added, count_memories(storage_dir)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--turns', type=int, default=2000)
+    parser.add_argument('--fsync', default='always', choices=('always', 'interval', 'never'))
+    parser.add_argument('--window', type=float, default=1.0, help="write-behind durability window in seconds")
+    parser.add_argument('--flush-every', type=int, default=100)
+    args = parser.parse_args()
+
+    turns = make_turns(args.turns)
+    print(f"{'mode':>12} {'turns/s':>10} {'flushes/turn':>13} {'p99 (ms)':>9}")
+    for mode in MODES:
+        throughput, flushes, p99 = run_mode(mode, turns, args.fsync, args.window, args.flush_every)
+        print(f"{mode:>12} {throughput:>10.1f} {flushes:>13.3f} {p99:>9.3f}")
+
+    print(f"\n{'ending':>12} {'added':>8} {'reopened':>9}")
+    for ending in ENDINGS:
+        added, found = check_shutdown(ending, min(args.turns, 200))
+        print(f"{ending:>12} {added:>8} {found:>9}")
+        if ending != 'crash':
+            assert found == added, f"{ending}: {added - found} memories lost on graceful shutdown"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Bulk import of historical transcripts into an IntelligentMemoryManager.
+
+Usage:
+    python bulk_import.py transcripts.jsonl [--storage-dir intelligent_memory_storage] [--processes N]
+                          [--batch-size 64] [--queue-size N] [--capacity N] [--context conversation]
+
+Each input line is a JSON object with a "content" string and an optional
+"context" (default --context); '-' reads standard input. The import runs as
+a pipeline:
+
+    read    the input is streamed and cut into batches of batch_size items
+    tag     a process pool tokenizes and POS-tags the batches (the CPU-bound part
+            of importance scoring and tag extraction)
+    merge   the main process embeds each batch with one encode call, then finds
+            related memories, scores and adds it, in input order, while the pool
+            tags the batches behind it
+
+At most queue_size batches are read ahead of the merge, and a slow merge
+holds back the reader. The store's capacity is enforced after every merged
+batch, so together memory use is bounded however long the input is. The
+store is saved once, as a snapshot, when every batch has been merged (see
+IntelligentMemoryManager.import_memories); unless something is evicted, the
+memories are those that add_memories(all items, batch_size) would create.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from intelligent_memory import IntelligentMemoryManager, pos_tag_texts
+
+DEFAULT_CONTEXT = 'conversation'
+
+
+@dataclass
+class ImportProgress:
+    memories: int  # merged so far
+    seconds: float  # since the import started
+
+    @property
+    def per_second(self) -> float:
+        return self.memories / self.seconds if self.seconds > 0 else 0.0
+
+
+def read_jsonl(source: Union[str, Iterable[str]], default_context: str = DEFAULT_CONTEXT) -> Iterator[Tuple[str, str]]:
+    """Yield (content, context) from a JSONL file path ('-' for stdin) or an iterable of lines."""
+    if isinstance(source, str):
+        if source == '-':
+            yield from read_jsonl(sys.stdin, default_context)
+            return
+        with open(source, 'r', encoding='utf-8') as f:
+            yield from read_jsonl(f, default_context)
+        return
+    for line_number, line in enumerate(source, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            content = record['content']
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Line {line_number}: expected a JSON object with 'content' ({e})") from None
+        yield content, record.get('context') or default_context
+
+
+def _tag_batch(contents: List[str]) -> Optional[List]:
+    """Pool task: POS tags of a batch, or None if tagging fails (the merge then tags it itself)."""
+    try:
+        return pos_tag_texts(contents)
+    except Exception:
+        return None
+
+
+def _tagged_batches(items: Iterable[Tuple[str, str]], batch_size: int, processes: int,
+                    queue_size: int) -> Iterator[Tuple[List[Tuple[str, str]], Optional[List]]]:
+    """Yield (batch, POS tags) in input order, tagging up to queue_size batches ahead in a process pool."""
+    items = iter(items)
+    batches = iter(lambda: list(islice(items, batch_size)), [])
+    if processes <= 0:
+        for batch in batches:
+            yield batch, None
+        return
+
+    pending: deque = deque()  # (batch, future) in input order
+    pool = ProcessPoolExecutor(processes)
+    try:
+        for batch in batches:
+            pending.append((batch, pool.submit(_tag_batch, [content for content, _ in batch])))
+            if len(pending) >= queue_size:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def bulk_import(manager: IntelligentMemoryManager, source: Union[str, Iterable[Tuple[str, str]]],
+                processes: Optional[int] = None, batch_size: int = 64, queue_size: Optional[int] = None,
+                progress: Optional[Callable[[ImportProgress], None]] = None) -> ImportProgress:
+    """Import (content, context) items, or a JSONL file path, into manager in one commit.
+
+    processes defaults to the CPU count; 0 tags in this process. queue_size
+    (default 2 * processes) bounds the batches read and tagged ahead of the
+    merge. progress is called with an ImportProgress after every merged batch.
+    Returns the final ImportProgress.
+    """
+    processes = (os.cpu_count() or 1) if processes is None else processes
+    queue_size = max(queue_size or 2 * processes, 1)
+    items = read_jsonl(source) if isinstance(source, str) else source
+    started = time.perf_counter()
+
+    def report(count: int):
+        if progress is not None:
+            progress(ImportProgress(count, time.perf_counter() - started))
+
+    batches = _tagged_batches(items, batch_size, processes, queue_size)
+    try:
+        count = manager.import_memories(batches, batch_size, report)
+    finally:
+        batches.close()  # Stops the pool if the merge failed
+    return ImportProgress(count, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help="JSONL file with one {\"content\": ..., \"context\": ...} per line, or -")
+    parser.add_argument('--storage-dir', default='intelligent_memory_storage')
+    parser.add_argument('--processes', type=int, default=None, help="tagging processes (default: CPU count)")
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--queue-size', type=int, default=None, help="batches in flight (default: 2 * processes)")
+    parser.add_argument('--capacity', type=int, default=None, help="memory capacity of the store, enforced after every merged batch")
+    parser.add_argument('--context', default=DEFAULT_CONTEXT, help="context of lines without one")
+    args = parser.parse_args()
+
+    manager = IntelligentMemoryManager(storage_dir=args.storage_dir)
+    if args.capacity is not None:
+        manager.memory_capacity = args.capacity
+    last_report = 0.0
+
+    def show(state: ImportProgress):
+        nonlocal last_report
+        if state.seconds - last_report >= 1:
+            last_report = state.seconds
+            print(f"\r{state.memories} memories, {state.per_second:.0f}/s", end='', file=sys.stderr, flush=True)
+
+    result = bulk_import(manager, read_jsonl(args.input, args.context), args.processes, args.batch_size,
+                         args.queue_size, show)
+    print(f"\rImported {result.memories} memories in {result.seconds:.1f}s ({result.per_second:.0f}/s); "
+          f"the store holds {len(manager.memories)}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,87 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Callable, Iterable, List, Dict, Optional, Tuple
 import json
 import os
 from datetime import datetime
-import nltk
-from nltk.tokenize import sent_tokenize
-from nltk.corpus import stopwords
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
+from collections import OrderedDict, deque
+from itertools import islice
+from operator import attrgetter
+from bisect import bisect_left
+import base64
+import hashlib
+import heapq
 import logging
-import pandas as pd
+import sys
+import threading
+import time
+from keyword_index import KeywordIndex
+from memory_log import MemoryLog, read_array_snapshot, remove_array_snapshot, write_array_snapshot
+from memory_stats import MemoryStats
+from vector_index import FlatIndex, VectorIndex, normalize, normalize_rows, top_k_rows
+from rwlock import NULL_LOCK, ReadWriteLock, reads, writes
+from metrics import NULL_METRICS, Metrics, timed
 
-# Download required NLTK data
-nltk.download('punkt')
-nltk.download('stopwords')
-nltk.download('averaged_perceptron_tagger')
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
-@dataclass
+# sentence_transformers, nltk and pandas are slow to import, so they are
+# imported on first use rather than when this module is loaded
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# NLTK data needed for tokenizing, tagging and stopwords, by resource path
+_NLTK_RESOURCES = {
+    'punkt': 'tokenizers/punkt',
+    'stopwords': 'corpora/stopwords',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+}
+_nltk_ready = False
+_stopword_set: Optional[frozenset] = None
+
+# Stages of add_memories whose cumulative seconds are kept in stage_seconds
+INGEST_STAGES = ('embed', 'relate', 'tag', 'score', 'store')
+_STAGE_HISTOGRAMS = {stage: f'add_{stage}_seconds' for stage in INGEST_STAGES}
+
+# Retrieval modes of get_relevant_memories
+RETRIEVAL_MODES = ('dense', 'hybrid')
+# Reciprocal rank fusion: a memory at rank r of a ranking scores 1 / (RRF_K + r)
+RRF_K = 60
+# Hybrid retrieval skips query tokens in more than this fraction of memories (their
+# BM25 idf is below log 2, and their postings are the longest), and fuses only
+# lexical matches scoring at least LEXICAL_CUTOFF times the best match
+MAX_DOC_FRACTION = 0.5
+LEXICAL_CUTOFF = 0.75
+# The prefilter scores at most this fraction of the index; past it the index search is faster
+PREFILTER_FRACTION = 0.05
+
+def _nltk():
+    """Import nltk, downloading its data on first use only if it is not installed yet."""
+    global _nltk_ready
+    import nltk
+    if not _nltk_ready:
+        for resource, path in _NLTK_RESOURCES.items():
+            try:
+                nltk.data.find(path)  # Local lookup, no network access
+            except LookupError:
+                nltk.download(resource, quiet=True)
+        _nltk_ready = True
+    return nltk
+
+def _stopwords() -> frozenset:
+    """English stopwords, read from the NLTK corpus once."""
+    global _stopword_set
+    if _stopword_set is None:
+        _nltk()
+        from nltk.corpus import stopwords
+        _stopword_set = frozenset(stopwords.words('english'))
+    return _stopword_set
+
+def pos_tag_texts(texts: List[str]) -> List[List[Tuple[str, str]]]:
+    """POS-tag many texts with one tagger instance."""
+    nltk = _nltk()
+    return nltk.pos_tag_sents([nltk.word_tokenize(text) for text in texts])
+
+@dataclass(slots=True)
 class IntelligentMemory:
     content: str
     timestamp: float
@@ -29,31 +93,189 @@ class IntelligentMemory:
     last_accessed: float = 0
     related_memories: List[str] = None
     tags: List[str] = None
+    memory_id: Optional[int] = None
     
-    def to_dict(self):
-        data = asdict(self)
-        if self.embedding is not None:
-            data['embedding'] = self.embedding.tolist()
+    def to_dict(self, include_embedding: bool = True):
+        data = {field.name: getattr(self, field.name) for field in fields(self)}
+        if not include_embedding:
+            del data['embedding']
+        elif self.embedding is not None:
+            data['embedding'] = np.asarray(self.embedding).tolist()
         return data
     
     @classmethod
     def from_dict(cls, data):
         if 'embedding' in data and data['embedding'] is not None:
-            data['embedding'] = np.array(data['embedding'])
+            data['embedding'] = np.array(data['embedding'], dtype=np.float32)
         return cls(**data)
 
+def _encode_embedding(embedding) -> Optional[str]:
+    """Pack an embedding as base64 float32 for log records."""
+    if embedding is None:
+        return None
+    return base64.b64encode(np.asarray(embedding, dtype=np.float32).tobytes()).decode('ascii')
+
+def _decode_embedding(data: Optional[str]) -> Optional[np.ndarray]:
+    if data is None:
+        return None
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+class EmbeddingCache:
+    """Bounded LRU cache of embeddings keyed by a hash of the text.
+    
+    With a directory, the cache is loaded from and saved to disk (embedding_cache.json
+    plus a memory-mapped array) so restarts skip model inference for text already seen.
+    Lookups update the LRU order, so the cache has its own mutex for concurrent readers.
+    """
+    
+    def __init__(self, max_size: int = 10000, directory: Optional[str] = None):
+        self.max_size = max_size
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._mutex = threading.Lock()
+        if directory is not None:
+            self.load()
+    
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, text: str) -> bool:
+        return self.key(text) in self._entries
+    
+    def get(self, text: str) -> Optional[np.ndarray]:
+        key = self.key(text)
+        with self._mutex:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+    
+    def put(self, text: str, embedding: np.ndarray):
+        key = self.key(text)
+        with self._mutex:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def seed(self, text: str, embedding: np.ndarray):
+        """Add an entry as the least recently used one, only if the cache has room."""
+        key = self.key(text)
+        with self._mutex:
+            if key not in self._entries and len(self._entries) < self.max_size:
+                self._entries[key] = embedding
+                self._entries.move_to_end(key, last=False)
+    
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+    
+    def save(self):
+        with self._mutex:
+            if self.directory is None or not self._entries:
+                return
+            keys = list(self._entries)
+            embeddings = np.stack([np.asarray(e, dtype=np.float32) for e in self._entries.values()])
+        write_array_snapshot(self.directory, 'embedding_cache', {'keys': keys}, {'embeddings': embeddings})
+    
+    def load(self):
+        snapshot = read_array_snapshot(self.directory, 'embedding_cache')
+        if snapshot is None:
+            return
+        header, arrays = snapshot
+        embeddings = list(arrays['embeddings'].view(np.ndarray))
+        for key, embedding in list(zip(header['keys'], embeddings))[-self.max_size:]:
+            self._entries[key] = embedding
+
+# Snapshot columns: numeric fields are stored as one .npy record array, text fields as JSON lists
+_NUMERIC_COLUMNS = np.dtype([
+    ('timestamp', np.float64),
+    ('importance', np.float64),
+    ('access_count', np.int64),
+    ('last_accessed', np.float64),
+    ('memory_id', np.int64),
+])
+_TEXT_COLUMNS = ('content', 'context', 'memory_type', 'related_memories', 'tags')
+
 class IntelligentMemoryManager:
-    def __init__(self, storage_dir: str = "intelligent_memory_storage"):
+    def __init__(self, storage_dir: str = "intelligent_memory_storage",
+                 model: Optional['SentenceTransformer'] = None,
+                 index: Optional[VectorIndex] = None,
+                 fsync: str = 'interval',
+                 compact_threshold: int = 1000,
+                 embedding_cache: Optional[EmbeddingCache] = None,
+                 model_name: str = DEFAULT_MODEL_NAME,
+                 lazy: bool = True,
+                 thread_safe: bool = False,
+                 metrics: Optional[Metrics] = None,
+                 embedding_precision: str = 'float32',
+                 rescore: int = 4):
         self.storage_dir = storage_dir
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
-        self.memories: List[IntelligentMemory] = []
+        # Without an injected model, model_name is loaded on first access of self.model
+        self._model = model
+        self._model_mutex = threading.Lock()
+        self.model_name = model_name
+        # Concurrent retrievals share the lock, mutations and saves hold it exclusively
+        self._lock = ReadWriteLock() if thread_safe else NULL_LOCK
+        # Stage latencies, counts and store sizes; NULL_METRICS records nothing
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.embedding_cache = embedding_cache if embedding_cache is not None else EmbeddingCache()
+        self.memories: List[IntelligentMemory] = []  # ordered by memory_id
+        # A quantized index ('float16' or 'int8') scores approximately; the top
+        # rescore * k candidates of a search are then re-scored with the exact
+        # float32 embeddings (rescore=0 disables this)
+        self.index = index if index is not None else FlatIndex(precision=embedding_precision)
+        self.rescore = rescore
+        self._memories_by_id: Dict[int, IntelligentMemory] = {}  # oldest first
+        self._next_memory_id = 0
         self.importance_threshold = 0.7  # Dynamic threshold
         self.memory_capacity = 1000  # Maximum number of memories to store
+        # Cumulative seconds add_memories spent in each of INGEST_STAGES
+        self.stage_seconds: Dict[str, float] = dict.fromkeys(INGEST_STAGES, 0.0)
+        self.metrics.track('memories', lambda: len(self.memories))
+        self.metrics.track('indexed_vectors', lambda: len(self.index))
+        self.metrics.track('embedding_cache_entries', lambda: len(self.embedding_cache))
+        self.metrics.track('embedding_cache_hits_total', lambda: self.embedding_cache.hits, kind='counter')
+        self.metrics.track('embedding_cache_misses_total', lambda: self.embedding_cache.misses, kind='counter')
+        # Importance -> ids of its memories, oldest first (ids of evicted memories are
+        # dropped lazily), plus a min-heap of those importances; see _lowest_retention
+        self._retention_groups: Dict[float, deque] = {}
+        self._retention_heap: List[float] = []
+        # Aggregates reported by analyze_memory_patterns, kept up to date on add and evict
+        self.stats = MemoryStats()
+        # BM25 index of memory contents for hybrid retrieval, built on the first hybrid query
+        self._keyword_index: Optional[KeywordIndex] = None
+        self._keyword_mutex = threading.Lock()
+        
+        # Mutations are appended to a log and compacted into a snapshot once the
+        # log holds at least compact_threshold records and as many as the snapshot
+        self._log = MemoryLog(os.path.join(storage_dir, 'memories.log'), fsync=fsync)
+        self.compact_threshold = compact_threshold
         
         # Create storage directory
         os.makedirs(storage_dir, exist_ok=True)
         self.load_memories()
         
+        # lazy=False loads the model and NLTK data up front instead of on first use
+        if not lazy:
+            _nltk()
+            self.model
+        
         # Initialize logging
         logging.basicConfig(
             filename=os.path.join(storage_dir, 'memory_operations.log'),
@@ -61,12 +283,44 @@ class IntelligentMemoryManager:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
     
+    @property
+    def model(self) -> 'SentenceTransformer':
+        if self._model is None:
+            with self._model_mutex:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+    
+    @model.setter
+    def model(self, model: 'SentenceTransformer'):
+        self._model = model
+    
     def _generate_embedding(self, text: str) -> np.ndarray:
-        """Generate embedding for text using sentence transformer."""
-        return self.model.encode([text])[0]
+        """Generate embedding for text using sentence transformer, reusing cached ones."""
+        embedding = self.embedding_cache.get(text)
+        if embedding is None:
+            embedding = self.model.encode([text])[0]
+            self.embedding_cache.put(text, embedding)
+        return embedding
     
-    def _calculate_importance(self, content: str, context: str, related_memories: List[IntelligentMemory]) -> float:
-        """Calculate importance score using multiple factors."""
+    def _generate_embeddings(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """Generate embeddings for many texts in batches of batch_size, encoding only uncached texts."""
+        embeddings = [self.embedding_cache.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, e in zip(texts, embeddings) if e is None))
+        if missing:
+            encoded = dict(zip(missing, self.model.encode(missing, batch_size=batch_size)))
+            for text, embedding in encoded.items():
+                self.embedding_cache.put(text, embedding)
+            embeddings = [encoded[text] if e is None else e for text, e in zip(texts, embeddings)]
+        return np.asarray(embeddings)
+    
+    def _calculate_importance(self, content: str, context: str, related_memories: List[IntelligentMemory],
+                              pos_tags: Optional[List[Tuple[str, str]]] = None) -> float:
+        """Calculate importance score using multiple factors.
+        
+        pos_tags may hold the already computed POS tags of content (see add_memories).
+        """
         base_importance = 0.5
         importance_factors = []
         
@@ -87,8 +341,10 @@ class IntelligentMemoryManager:
         
         # Named entity factor
         try:
-            tokens = nltk.word_tokenize(content)
-            pos_tags = nltk.pos_tag(tokens)
+            if pos_tags is None:
+                nltk = _nltk()
+                tokens = nltk.word_tokenize(content)
+                pos_tags = nltk.pos_tag(tokens)
             named_entities = [word for word, pos in pos_tags if pos in ['NNP', 'NNPS']]
             entity_factor = min(len(named_entities) / 5, 1.0) * 0.3
             importance_factors.append(entity_factor)
@@ -97,125 +353,486 @@ class IntelligentMemoryManager:
         
         return base_importance + sum(importance_factors)
     
-    def _find_related_memories(self, content: str, embedding: np.ndarray) -> List[IntelligentMemory]:
-        """Find related memories using embedding similarity."""
-        if not self.memories:
-            return []
+    def _find_related_batch(self, embeddings: np.ndarray) -> List[List[IntelligentMemory]]:
+        """Find related memories for a batch of new memories with one matrix product.
         
-        similarities = []
-        for memory in self.memories:
-            if memory.embedding is not None:
-                similarity = cosine_similarity([embedding], [memory.embedding])[0][0]
-                similarities.append((memory, similarity))
+        Item i may also relate to items before it in the batch, as it would if
+        the batch were added one memory at a time; those are returned as indices
+        into the batch instead of memories.
+        """
+        store_results = self._search_batch(embeddings, 5)
+        normalized = normalize_rows(embeddings)
+        batch_similarities = normalized @ normalized.T
         
-        # Sort by similarity and return top related memories
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return [memory for memory, sim in similarities[:5] if sim > 0.5]
+        related = []
+        for i, (ids, similarities) in enumerate(store_results):
+            candidates = [
+                (sim, self._memories_by_id[memory_id])
+                for memory_id, sim in zip(ids.tolist(), similarities.tolist())
+            ]
+            candidates += [(sim, j) for j, sim in enumerate(batch_similarities[i, :i].tolist())]
+            candidates.sort(key=lambda x: x[0], reverse=True)
+            related.append([candidate for sim, candidate in candidates[:5] if sim > 0.5])
+        return related
     
-    def _extract_tags(self, content: str) -> List[str]:
-        """Extract relevant tags from content."""
-        tokens = nltk.word_tokenize(content.lower())
-        pos_tags = nltk.pos_tag(tokens)
+    def _extract_tags(self, content: str, pos_tags: Optional[List[Tuple[str, str]]] = None) -> List[str]:
+        """Extract relevant tags from content.
+        
+        pos_tags may hold the already computed POS tags of content, the same
+        ones _calculate_importance uses.
+        """
+        if pos_tags is None:
+            nltk = _nltk()
+            tokens = nltk.word_tokenize(content)
+            pos_tags = nltk.pos_tag(tokens)
         
         # Extract nouns and named entities as tags
+        stopwords = _stopwords()
         tags = []
         for word, pos in pos_tags:
-            if pos.startswith(('NN', 'JJ')) and word not in stopwords.words('english'):
-                tags.append(word)
+            word = word.lower()
+            if pos.startswith(('NN', 'JJ')) and word not in stopwords:
+                tags.append(sys.intern(word))
         
-        return list(set(tags))[:5]  # Return up to 5 unique tags
+        return list(dict.fromkeys(tags))[:5]  # Return up to 5 unique tags, first seen first
     
     def add_memory(self, content: str, context: str) -> IntelligentMemory:
         """Add a new memory with intelligent processing."""
-        # Generate embedding
-        embedding = self._generate_embedding(content)
+        return self.add_memories([(content, context)])[0]
+    
+    @timed('add_seconds')
+    @writes
+    def add_memories(self, items: Iterable[Tuple[str, str]], batch_size: int = 32) -> List[IntelligentMemory]:
+        """Add many (content, context) memories with batched processing.
+        
+        Embedding, related-memory search and POS tagging run once per batch of
+        batch_size items, and the mutation log is written once per batch. Each
+        memory is scored as if the items were added one at a time; capacity is
+        enforced once at the end, so a call never evicts its own items midway.
+        """
+        items = list(items)
+        memories = []
+        for start in range(0, len(items), batch_size):
+            memories.extend(self._add_batch(items[start:start + batch_size], batch_size))
+        self.metrics.increment('adds_total', len(memories))
+        
+        with self.metrics.timer('capacity_seconds'):
+            self._manage_capacity()
+        
+        # Compact the mutation log into a snapshot once it has grown large
+        if self._log.records >= max(self.compact_threshold, len(self.memories)):
+            self.save_memories()
+        return memories
+    
+    @timed('import_seconds')
+    @writes
+    def import_memories(self, batches: Iterable[Tuple[List[Tuple[str, str]], Optional[List]]], batch_size: int = 32,
+                        progress: Optional[Callable[[int], None]] = None) -> int:
+        """Add batches of (content, context) items with their POS tags, committed as one snapshot.
+        
+        This is the merge stage of bulk_import: the POS tags of each batch (None
+        to tag it here) are computed elsewhere. Capacity is enforced after every
+        batch, so the store never holds much more than memory_capacity memories;
+        unless something is evicted, the memories match those of
+        add_memories(all items, batch_size). Neither the adds nor the evictions
+        they cause are logged; the store is saved once at the end, and if the
+        import fails (or the process dies) before that snapshot is written the
+        saved store is what remains, so it is all or nothing. progress(count)
+        is called after every batch. Returns the number of memories added.
+        """
+        if self._log.records:
+            # Commit earlier mutations first, so that replaying them on top of the
+            # import's snapshot can never bring back a memory it evicted
+            self.save_memories()
+        added = 0
+        try:
+            for items, pos_tags in batches:
+                added += len(self._add_batch(items, batch_size, pos_tags, log=False))
+                self._manage_capacity(log=False)
+                if progress is not None:
+                    progress(added)
+            self.save_memories()
+        except BaseException:
+            self.memories = []
+            self.load_memories()
+            raise
+        self.metrics.increment('adds_total', added)
+        return added
+    
+    def _add_batch(self, items: List[Tuple[str, str]], batch_size: int, pos_tags: Optional[List] = None,
+                   log: bool = True) -> List[IntelligentMemory]:
+        contents = [content for content, _ in items]
+        
+        # Generate embeddings
+        started = time.perf_counter()
+        embeddings = self._generate_embeddings(contents, batch_size)
+        started = self._record_stage('embed', started)
         
         # Find related memories
-        related_memories = self._find_related_memories(content, embedding)
-        
-        # Calculate importance
-        importance = self._calculate_importance(content, context, related_memories)
-        
-        # Extract tags
-        tags = self._extract_tags(content)
-        
-        # Create memory
-        memory = IntelligentMemory(
-            content=content,
-            timestamp=datetime.now().timestamp(),
-            importance=importance,
-            context=context,
-            memory_type='active' if importance > self.importance_threshold else 'archive',
-            embedding=embedding,
-            related_memories=[m.content for m in related_memories],
-            tags=tags
-        )
+        related = self._find_related_batch(embeddings)
+        started = self._record_stage('relate', started)
         
-        # Add memory and manage capacity
-        self.memories.append(memory)
-        self._manage_capacity()
+        # POS-tag the batch once; importance (entities) and tag extraction share the tags
+        if pos_tags is None:
+            try:
+                pos_tags = pos_tag_texts(contents)
+            except Exception as e:
+                logging.warning(f"Error in POS tagging: {e}")
+                pos_tags = [None] * len(items)
+        started = self._record_stage('tag', started)
         
-        # Log operation
-        logging.info(f"Added memory: {content[:50]}... | Importance: {importance:.2f}")
+        memories = []
+        records = []
+        for i, (content, context) in enumerate(items):
+            related_memories = [m if isinstance(m, IntelligentMemory) else memories[m] for m in related[i]]
+            
+            # Calculate importance
+            importance = self._calculate_importance(content, context, related_memories, pos_tags[i])
+            
+            # Extract tags
+            tags = self._extract_tags(content, pos_tags[i])
+            
+            # Create memory
+            memory = IntelligentMemory(
+                content=content,
+                timestamp=datetime.now().timestamp(),
+                importance=importance,
+                context=sys.intern(context),
+                memory_type='active' if importance > self.importance_threshold else 'archive',
+                embedding=embeddings[i],
+                related_memories=[m.content for m in related_memories],
+                tags=tags
+            )
+            
+            self.memories.append(memory)
+            self._register(memory)
+            memories.append(memory)
+            records.append({
+                'op': 'add',
+                'memory': memory.to_dict(include_embedding=False),
+                'embedding': _encode_embedding(memory.embedding)
+            })
+            
+            # Log operation
+            logging.info(f"Added memory: {content[:50]}... | Importance: {importance:.2f}")
+        started = self._record_stage('score', started)
         
-        # Save memories
-        self.save_memories()
-        return memory
+        if log:
+            self._log.append_many(records)
+        self._record_stage('store', started)
+        return memories
     
-    def _manage_capacity(self):
-        """Manage memory capacity using intelligent selection."""
-        if len(self.memories) > self.memory_capacity:
-            # Calculate retention scores
-            retention_scores = []
+    def _record_stage(self, stage: str, started: float) -> float:
+        """Add the time since started to stage_seconds[stage]; returns the current time."""
+        now = time.perf_counter()
+        self.stage_seconds[stage] += now - started
+        self.metrics.observe(_STAGE_HISTOGRAMS[stage], now - started)
+        return now
+    
+    def _manage_capacity(self, log: bool = True):
+        """Manage memory capacity using intelligent selection.
+        
+        Evicts the memories with the lowest retention scores, as sorting all
+        scores would; only memories with exactly equal scores may be chosen
+        differently. Costs O(log n) per eviction plus the removal from
+        self.memories. log=False leaves the evictions to the next snapshot.
+        """
+        current_time = datetime.now().timestamp()
+        while len(self.memories) > self.memory_capacity:
+            memory = self._lowest_retention(current_time)
+            del self.memories[bisect_left(self.memories, memory.memory_id, key=attrgetter('memory_id'))]
+            self._unregister(memory)
+            if log:
+                self._log.append({'op': 'evict', 'memory_id': memory.memory_id})
+            self.metrics.increment('evictions_total')
+    
+    @staticmethod
+    def _retention_score(memory: IntelligentMemory, current_time: float) -> float:
+        # Factors for retention
+        recency = 1 / (current_time - memory.timestamp + 1)
+        importance = memory.importance
+        access_frequency = memory.access_count / (current_time - memory.timestamp + 1)
+        
+        # Combined retention score
+        return (
+            0.4 * importance +
+            0.3 * recency +
+            0.3 * access_frequency
+        )
+    
+    def _lowest_retention(self, current_time: float) -> IntelligentMemory:
+        """Find the memory with the lowest retention score.
+        
+        0.4 * importance + 0.3 * recency bounds a score from below, and among
+        memories of equal importance the bound grows from oldest to newest.
+        Importances are visited in increasing order, and each group from its
+        oldest memory, until the bound exceeds the lowest score seen; access
+        counts only raise scores, so they are read when a memory is scored.
+        """
+        lowest, lowest_score = None, float('inf')
+        visited = []
+        while self._retention_heap and 0.4 * self._retention_heap[0] <= lowest_score:
+            importance = heapq.heappop(self._retention_heap)
+            group = self._retention_groups[importance]
+            while group and group[0] not in self._memories_by_id:
+                group.popleft()
+            if not group:
+                del self._retention_groups[importance]
+                continue
+            visited.append(importance)
+            for memory_id in group:
+                memory = self._memories_by_id.get(memory_id)
+                if memory is None:
+                    continue  # Evicted
+                if 0.4 * memory.importance + 0.3 * (1 / (current_time - memory.timestamp + 1)) > lowest_score:
+                    break  # Newer memories of this importance score higher still
+                score = self._retention_score(memory, current_time)
+                if score < lowest_score:
+                    lowest, lowest_score = memory, score
+        for importance in visited:
+            heapq.heappush(self._retention_heap, importance)
+        return lowest
+    
+    @timed('query_seconds')
+    @reads
+    def get_relevant_memories(self, query: str, top_k: int = 5, mode: str = 'dense',
+                              prefilter: bool = False) -> List[Tuple[IntelligentMemory, float]]:
+        """Get relevant memories using semantic search, or hybrid lexical and semantic search.
+        
+        mode='hybrid' fuses the BM25 ranking of memory contents with the semantic
+        ranking by reciprocal rank fusion, so exact matches of rare tokens such as
+        names and error codes rank high; scores are then the fused scores. With
+        prefilter=True, only memories sharing a token with the query are scored
+        semantically, instead of searching the whole vector index (tokens in more
+        than MAX_DOC_FRACTION of memories do not count); if fewer than top_k
+        memories share one, or more than PREFILTER_FRACTION of the index, the
+        whole index is searched after all.
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        with self.metrics.timer('query_embed_seconds'):
+            query_embedding = self._generate_embedding(query)
+        self.metrics.increment('queries_total')
+        with self.metrics.timer('query_rank_seconds'):
+            return self._rank(query, query_embedding, top_k, mode, prefilter)
+    
+    @timed('query_batch_seconds')
+    @reads
+    def get_relevant_memories_batch(self, queries: List[str], top_k: int = 5, mode: str = 'dense',
+                                    prefilter: bool = False) -> List[List[Tuple[IntelligentMemory, float]]]:
+        """Get relevant memories for several queries, embedding them with one encode call."""
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+        if not queries:
+            return []
+        with self.metrics.timer('query_embed_seconds'):
+            query_embeddings = self._generate_embeddings(queries)
+        self.metrics.increment('queries_total', len(queries))
+        with self.metrics.timer('query_rank_seconds'):
+            return [self._rank(query, embedding, top_k, mode, prefilter)
+                    for query, embedding in zip(queries, query_embeddings)]
+    
+    @property
+    def _rescoring(self) -> bool:
+        return bool(self.rescore) and self.index.precision != 'float32'
+    
+    def _search(self, query_embedding: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """index.search, re-scoring the top rescore * k candidates of a quantized index exactly."""
+        if not self._rescoring:
+            return self.index.search(query_embedding, k)
+        ids, _ = self.index.search(query_embedding, self.rescore * k)
+        similarities = self._similarity(ids.tolist(), query_embedding)
+        best = np.lexsort((ids, -similarities))[:k]
+        return ids[best], similarities[best]
+    
+    def _search_batch(self, query_embeddings: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """index.search_batch, re-scored like _search."""
+        if not self._rescoring:
+            return self.index.search_batch(query_embeddings, k)
+        results = []
+        candidates = self.index.search_batch(query_embeddings, self.rescore * k)
+        for query_embedding, (ids, _) in zip(query_embeddings, candidates):
+            similarities = self._similarity(ids.tolist(), query_embedding)
+            best = np.lexsort((ids, -similarities))[:k]
+            results.append((ids[best], similarities[best]))
+        return results
+    
+    def _similarity(self, memory_ids: List[int], query_embedding: np.ndarray) -> np.ndarray:
+        """index.similarity, computed from the float32 embeddings if the index is quantized."""
+        if not self._rescoring or not memory_ids:
+            return self.index.similarity(memory_ids, query_embedding)
+        embeddings = np.stack([self._memories_by_id[i].embedding for i in memory_ids])
+        return normalize_rows(embeddings) @ normalize(query_embedding)
+    
+    def _rank(self, query: str, query_embedding: np.ndarray, top_k: int, mode: str,
+              prefilter: bool) -> List[Tuple[IntelligentMemory, float]]:
+        if mode == 'hybrid':
+            return self._rank_hybrid(query, query_embedding, top_k, prefilter)
+        return self._rank_memories(query_embedding, top_k)
+    
+    def _relevance(self, memory_id: int, similarity: float, current_time: float) -> float:
+        # Combined relevance score of semantic similarity and recency
+        recency = 1 / (current_time - self._memories_by_id[memory_id].timestamp + 1)
+        return 0.7 * similarity + 0.3 * recency
+    
+    def _rank_hybrid(self, query: str, query_embedding: np.ndarray, top_k: int,
+                     prefilter: bool) -> List[Tuple[IntelligentMemory, float]]:
+        if top_k <= 0 or not self.memories:
+            return []
+        depth = max(4 * top_k, 50)  # Length of each ranking that is fused
+        
+        matches = self._lexical_index().scores(query, 'bm25', MAX_DOC_FRACTION)
+        lexical_scores = matches
+        if matches:
+            # Weak matches of common tokens would mostly repeat the semantic ranking
+            cutoff = LEXICAL_CUTOFF * max(matches.values())
+            lexical_scores = {i: score for i, score in matches.items() if score >= cutoff}
+        lexical = heapq.nsmallest(depth, lexical_scores, key=lambda i: (-lexical_scores[i], i))
+        
+        # The prefilter covers every token-sharing memory, not just the strong matches fused above
+        candidates = []
+        if prefilter and len(matches) <= PREFILTER_FRACTION * len(self.index):
+            candidates = sorted(i for i in matches if i in self.index)
+        if len(candidates) >= top_k:
             current_time = datetime.now().timestamp()
+            similarities = self._similarity(candidates, query_embedding).astype(np.float64)
+            timestamps = np.fromiter((self._memories_by_id[i].timestamp for i in candidates), np.float64,
+                                     len(candidates))
+            relevance = 0.7 * similarities + 0.3 / (current_time - timestamps + 1)  # as _relevance
+            dense = [candidates[row] for row in top_k_rows(relevance, depth).tolist()]
+        else:
+            dense = [memory.memory_id for memory, _ in self._rank_memories(query_embedding, depth)]
+        
+        fused: Dict[int, float] = {}
+        for ranking in (lexical, dense):
+            for rank, memory_id in enumerate(ranking, 1):
+                fused[memory_id] = fused.get(memory_id, 0.0) + 1 / (RRF_K + rank)
+        ranked = heapq.nsmallest(top_k, fused, key=lambda i: (-fused[i], i))
+        return [(self._memories_by_id[memory_id], fused[memory_id]) for memory_id in ranked]
+    
+    def _lexical_index(self) -> KeywordIndex:
+        if self._keyword_index is None:
+            with self._keyword_mutex:  # Queries may run concurrently
+                if self._keyword_index is None:
+                    keyword_index = KeywordIndex()
+                    for memory in self.memories:
+                        keyword_index.add(memory.memory_id, memory.content)
+                    self._keyword_index = keyword_index
+        return self._keyword_index
+    
+    def _rank_memories(self, query_embedding: np.ndarray, top_k: int) -> List[Tuple[IntelligentMemory, float]]:
+        current_time = datetime.now().timestamp()
+        if top_k <= 0 or len(self.index) == 0:
+            return []
+        
+        def relevance(memory_id: int, similarity: float) -> float:
+            return self._relevance(memory_id, similarity, current_time)
+        
+        # Score the most similar memories plus the newest ones (which the recency
+        # factor can lift), widening both until no unscored memory can make the top-k
+        search_k = recent_k = top_k
+        while True:
+            ids, similarities = self._search(query_embedding, 2 * search_k)
+            scores = {
+                memory_id: relevance(memory_id, sim)
+                for memory_id, sim in zip(ids.tolist(), similarities.tolist())
+            }
             
-            for memory in self.memories:
-                # Factors for retention
-                recency = 1 / (current_time - memory.timestamp + 1)
-                importance = memory.importance
-                access_frequency = memory.access_count / (current_time - memory.timestamp + 1)
-                
-                # Combined retention score
-                retention_score = (
-                    0.4 * importance +
-                    0.3 * recency +
-                    0.3 * access_frequency
-                )
-                retention_scores.append((memory, retention_score))
+            newest = list(islice((i for i in reversed(self._memories_by_id) if i in self.index), recent_k + 1))
+            recent_ids = [i for i in newest[:recent_k] if i not in scores]
+            for memory_id, sim in zip(recent_ids, self._similarity(recent_ids, query_embedding).tolist()):
+                scores[memory_id] = relevance(memory_id, sim)
             
-            # Sort by retention score and keep top memories
-            retention_scores.sort(key=lambda x: x[1], reverse=True)
-            self.memories = [m for m, _ in retention_scores[:self.memory_capacity]]
+            ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:top_k]
+            if len(ids) < 2 * search_k or len(newest) <= recent_k:
+                break  # every reachable memory was scored
+            bound = relevance(newest[-1], float(similarities[-1]))
+            if len(ranked) == top_k and ranked[-1][1] >= bound:
+                break
+            search_k *= 4
+            recent_k *= 4
+        
+        return [(self._memories_by_id[memory_id], score) for memory_id, score in ranked]
     
-    def get_relevant_memories(self, query: str, top_k: int = 5) -> List[Tuple[IntelligentMemory, float]]:
-        """Get relevant memories using semantic search."""
-        query_embedding = self._generate_embedding(query)
+    def _register(self, memory: IntelligentMemory):
+        """Assign memory an id if it has none and add it to the id map and vector index."""
+        if memory.memory_id is None:
+            memory.memory_id = self._next_memory_id
+        self._next_memory_id = max(self._next_memory_id, memory.memory_id + 1)
+        self._memories_by_id[memory.memory_id] = memory
+        if memory.embedding is not None and memory.memory_id not in self.index:
+            self.index.add(memory.memory_id, memory.embedding)
+        group = self._retention_groups.get(memory.importance)
+        if group is None:
+            group = self._retention_groups[memory.importance] = deque()
+            heapq.heappush(self._retention_heap, memory.importance)
+        group.append(memory.memory_id)
+        self.stats.add(memory)
+        if self._keyword_index is not None:
+            self._keyword_index.add(memory.memory_id, memory.content)
+    
+    def _unregister(self, memory: IntelligentMemory):
+        """Drop an evicted memory from the id map and vector index."""
+        del self._memories_by_id[memory.memory_id]
+        if memory.memory_id in self.index:
+            self.index.remove(memory.memory_id)
+        self.stats.remove(memory)
+        if self._keyword_index is not None:
+            self._keyword_index.remove(memory.memory_id, memory.content)
+    
+    def _reindex(self):
+        """Rebuild the id map and vector index for self.memories, reusing the saved index if present.
         
-        relevant_memories = []
-        current_time = datetime.now().timestamp()
+        A rebuildable index (flat float32) is never saved; it is rebuilt from the
+        embeddings, which the snapshot already holds.
+        """
+        self._memories_by_id = {}
+        self.index.clear()
+        if not self.index.rebuildable and os.path.exists(os.path.join(self.storage_dir, 'vector_index.json')):
+            try:
+                self.index.load(self.storage_dir)
+            except Exception as e:
+                logging.warning(f"Rebuilding vector index: {e}")
+                self.index.clear()
         
-        for memory in self.memories:
-            if memory.embedding is not None:
-                # Calculate semantic similarity
-                similarity = cosine_similarity([query_embedding], [memory.embedding])[0][0]
-                
-                # Calculate recency factor
-                recency = 1 / (current_time - memory.timestamp + 1)
-                
-                # Combined relevance score
-                relevance = 0.7 * similarity + 0.3 * recency
-                
-                relevant_memories.append((memory, relevance))
-        
-        # Sort by relevance and return top-k
-        relevant_memories.sort(key=lambda x: x[1], reverse=True)
-        return relevant_memories[:top_k]
-    
-    def analyze_memory_patterns(self) -> Dict:
-        """Analyze patterns in stored memories."""
+        known_ids = [m.memory_id for m in self.memories if m.memory_id is not None]
+        self._next_memory_id = max(self._next_memory_id, max(known_ids, default=-1) + 1)
+        chronological = sorted(self.memories, key=lambda m: m.timestamp)
+        for memory in chronological:
+            if memory.memory_id is None:
+                memory.memory_id = self._next_memory_id
+                self._next_memory_id += 1
+        
+        self._memories_by_id = {m.memory_id: m for m in chronological}
+        self.memories.sort(key=attrgetter('memory_id'))
+        self._retention_groups = {}
+        for memory in chronological:
+            self._retention_groups.setdefault(memory.importance, deque()).append(memory.memory_id)
+        self._retention_heap = list(self._retention_groups)
+        heapq.heapify(self._retention_heap)
+        self.stats = MemoryStats(self.memories)
+        self._keyword_index = None
+        missing = [m for m in chronological if m.embedding is not None and m.memory_id not in self.index]
+        self.index.add_many([m.memory_id for m in missing], [m.embedding for m in missing])
+        
+        # Drop entries of memories that are no longer stored
+        if len(self.index) > sum(m.embedding is not None for m in chronological):
+            for memory_id in set(self.index.ids.tolist()) - set(self._memories_by_id):
+                self.index.remove(memory_id)
+    
+    @reads
+    def analyze_memory_patterns(self, rebuild: bool = False) -> Dict:
+        """Analyze patterns in stored memories.
+        
+        The analysis comes from running aggregates (see memory_stats). rebuild=True
+        recomputes it with pandas from every memory instead, to verify them.
+        """
+        if not rebuild:
+            return self.stats.analysis()
         if not self.memories:
             return {}
         
+        import pandas as pd
         df = pd.DataFrame([{
             'importance': m.importance,
             'context': m.context,
@@ -238,16 +855,118 @@ class IntelligentMemoryManager:
         
         return analysis
     
+    @timed('save_seconds')
+    @writes
     def save_memories(self):
-        """Save memories to disk."""
-        memory_data = [memory.to_dict() for memory in self.memories]
-        with open(os.path.join(self.storage_dir, 'memories.json'), 'w') as f:
-            json.dump(memory_data, f, indent=2)
+        """Write a full snapshot of memories and the vector index (unless rebuildable), then empty the mutation log.
+        
+        The snapshot is columnar: embeddings and numeric fields are raw .npy arrays
+        and text fields are JSON columns in memory_snapshot.json, so loading can
+        memory-map the vectors and skip per-memory JSON objects.
+        """
+        dim = next((len(m.embedding) for m in self.memories if m.embedding is not None), 0)
+        embeddings = np.zeros((len(self.memories), dim), dtype=np.float32)
+        has_embedding = np.zeros(len(self.memories), dtype=bool)
+        for row, memory in enumerate(self.memories):
+            if memory.embedding is not None:
+                embeddings[row] = memory.embedding
+                has_embedding[row] = True
+        
+        numeric = np.zeros(len(self.memories), dtype=_NUMERIC_COLUMNS)
+        for name in numeric.dtype.names:
+            numeric[name] = [getattr(m, name) for m in self.memories]
+        header = {name: [getattr(m, name) for m in self.memories] for name in _TEXT_COLUMNS}
+        header['next_memory_id'] = self._next_memory_id  # Ids of evicted memories are never reused
+        arrays = {'embeddings': embeddings, 'has_embedding': has_embedding, 'numeric': numeric}
+        
+        files = write_array_snapshot(self.storage_dir, 'memory_snapshot', header, arrays)
+        if self.index.rebuildable:
+            remove_array_snapshot(self.storage_dir, 'vector_index')  # Saved by an earlier version or index type
+        else:
+            self.index.save(self.storage_dir)
+        if self.index.precision != 'float32':
+            # Leave the exact embeddings, only read to re-score, on disk as after a load
+            embeddings = np.load(os.path.join(self.storage_dir, files['embeddings']), mmap_mode='r').view(np.ndarray)
+            for row in np.flatnonzero(has_embedding).tolist():
+                self.memories[row].embedding = embeddings[row]
+        self.embedding_cache.save()
+        self._log.reset()
+        
+        # The snapshot supersedes the JSON format used by earlier versions
+        legacy_file = os.path.join(self.storage_dir, 'memories.json')
+        if os.path.exists(legacy_file):
+            os.remove(legacy_file)
+    
+    def _replay_log(self, records: List[Dict]):
+        """Apply logged adds and evictions on top of the loaded snapshot."""
+        present = {m.memory_id: m for m in self.memories}
+        for record in records:  # strictly in log order, so an add after an evict of its id is applied
+            if record['op'] == 'add':
+                memory = IntelligentMemory.from_dict(record['memory'])
+                if 'embedding' in record:
+                    memory.embedding = _decode_embedding(record['embedding'])
+                if memory.memory_id not in present:
+                    present[memory.memory_id] = memory
+                self._next_memory_id = max(self._next_memory_id, memory.memory_id + 1)
+            elif record['op'] == 'evict':
+                present.pop(record['memory_id'], None)
+        if records:
+            self.memories = list(present.values())
     
+    def _share_strings(self):
+        """Make loaded memories share one object per distinct string.
+        
+        Decoded JSON gives every context, tag and related content its own copy.
+        related_memories holds contents of other memories, so as after an add it
+        references their strings rather than duplicating the text.
+        """
+        contents = {m.content: m.content for m in self.memories}
+        for memory in self.memories:
+            memory.context = sys.intern(memory.context)
+            memory.memory_type = sys.intern(memory.memory_type)
+            if memory.tags:
+                memory.tags = [sys.intern(tag) for tag in memory.tags]
+            if memory.related_memories:
+                memory.related_memories = [contents.setdefault(text, text) for text in memory.related_memories]
+    
+    @timed('load_seconds')
+    @writes
     def load_memories(self):
-        """Load memories from disk."""
-        memory_file = os.path.join(self.storage_dir, 'memories.json')
-        if os.path.exists(memory_file):
-            with open(memory_file, 'r') as f:
+        """Load the last snapshot from disk and replay the mutation log on top of it.
+        
+        Embeddings are read-only views into the memory-mapped snapshot array, so
+        startup does not copy the vectors.
+        """
+        snapshot = read_array_snapshot(self.storage_dir, 'memory_snapshot')
+        legacy_file = os.path.join(self.storage_dir, 'memories.json')
+        migrating = False
+        self._next_memory_id = 0
+        if snapshot is not None:
+            header, arrays = snapshot
+            self._next_memory_id = header.get('next_memory_id', 0)
+            embeddings = arrays['embeddings'].view(np.ndarray)  # plain views index faster than np.memmap
+            numeric = arrays['numeric']
+            columns = {name: header[name] for name in _TEXT_COLUMNS}
+            columns.update((name, numeric[name].tolist()) for name in numeric.dtype.names)
+            columns['embedding'] = list(embeddings)
+            for row in np.flatnonzero(~arrays['has_embedding']).tolist():
+                columns['embedding'][row] = None
+            self.memories = list(map(IntelligentMemory, *(columns[field.name] for field in fields(IntelligentMemory))))
+        elif os.path.exists(legacy_file):
+            with open(legacy_file, 'r') as f:
                 memory_data = json.load(f)
             self.memories = [IntelligentMemory.from_dict(m) for m in memory_data]
+            migrating = True
+        
+        self._replay_log(self._log.replay())
+        self._reindex()
+        self._share_strings()
+        
+        # Seed the embedding cache (newest first) so re-adding stored content skips the model
+        for memory in reversed(self.memories):
+            if len(self.embedding_cache) >= self.embedding_cache.max_size:
+                break
+            if memory.embedding is not None:
+                self.embedding_cache.seed(memory.content, memory.embedding)
+        if migrating:
+            self.save_memories()
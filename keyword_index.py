@@ -0,0 +1,108 @@
+"""Inverted keyword index shared by MemoryManager and PersistentMemoryManager.
+
+Memories are tokenized once when they are added (lowercased, split on
+whitespace, as keyword retrieval always did) into posting lists of
+token -> {memory id: term frequency}. A query only touches the postings of its
+own tokens.
+
+Rankers:
+    'overlap' - number of distinct query tokens in the memory (the original score)
+    'bm25'    - Okapi BM25 over the same postings
+"""
+import heapq
+import math
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Tuple
+
+RANKERS = ('overlap', 'bm25')
+
+
+def tokenize(text: str) -> List[str]:
+    return text.lower().split()
+
+
+def bm25_term(frequency: int, length: int, doc_freq: int, n_docs: int, mean_length: float,
+              k1: float = 1.5, b: float = 0.75) -> float:
+    """BM25 contribution of one query term occurring frequency times in a document of length tokens."""
+    idf = math.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+    norm = 1 - b + b * length / mean_length if mean_length else 1.0
+    return idf * frequency * (k1 + 1) / (frequency + k1 * norm)
+
+
+class KeywordIndex:
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._lengths
+
+    def add(self, doc_id: int, text: str):
+        tokens = tokenize(text)
+        for token, frequency in Counter(tokens).items():
+            self._postings.setdefault(token, {})[doc_id] = frequency
+        self._lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, doc_id: int, text: str):
+        """Remove a document; text must be the text it was added with."""
+        for token in set(tokenize(text)):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[token]
+        self._total_length -= self._lengths.pop(doc_id, 0)
+
+    def clear(self):
+        self._postings.clear()
+        self._lengths.clear()
+        self._total_length = 0
+
+    def scores(self, query: str, ranker: str = 'overlap', max_doc_fraction: float = 1.0) -> Dict[int, float]:
+        """Score every document that shares at least one token with query.
+
+        Tokens in more than max_doc_fraction of the documents are skipped.
+        """
+        if ranker not in RANKERS:
+            raise ValueError(f"Unknown ranker '{ranker}', expected one of {RANKERS}")
+
+        scores: Dict[int, float] = {}
+        max_doc_freq = max_doc_fraction * len(self._lengths)
+        terms = [token for token in set(tokenize(query))
+                 if token in self._postings and len(self._postings[token]) <= max_doc_freq]
+        if ranker == 'overlap':
+            for token in terms:
+                for doc_id in self._postings[token]:
+                    scores[doc_id] = scores.get(doc_id, 0) + 1
+            return scores
+
+        n_docs = len(self._lengths)
+        mean_length = self._total_length / n_docs if n_docs else 0.0
+        for token in terms:
+            postings = self._postings[token]
+            for doc_id, frequency in postings.items():
+                term = bm25_term(frequency, self._lengths[doc_id], len(postings), n_docs, mean_length, self.k1, self.b)
+                scores[doc_id] = scores.get(doc_id, 0.0) + term
+        return scores
+
+    def search(self, query: str, top_k: int, tie_key: Callable[[int], Tuple],
+               all_ids: Iterable[int] = (), ranker: str = 'overlap') -> List[int]:
+        """Return the top_k document ids by descending score, then ascending tie_key.
+
+        If fewer than top_k documents match, the rest are filled with
+        non-matching ids from all_ids in tie_key order, the way a full sort
+        over every memory with a score of 0 would.
+        """
+        scores = self.scores(query, ranker)
+        ranked = heapq.nsmallest(top_k, scores, key=lambda doc_id: (-scores[doc_id],) + tie_key(doc_id))
+        if len(ranked) < top_k:
+            rest = (doc_id for doc_id in all_ids if doc_id not in scores)
+            ranked += heapq.nsmallest(top_k - len(ranked), rest, key=tie_key)
+        return ranked
@@ -0,0 +1,279 @@
+"""Append-only mutation log shared by the persistent memory managers.
+
+Instead of rewriting memories.json on every change, each mutation (add, tier
+move, eviction) is appended to ``memories.log`` as one JSON line. On startup the
+log is replayed on top of the last snapshot, and once it grows as large as the
+snapshot it is compacted into a new snapshot and emptied.
+
+Replay is idempotent (adding a known memory id or moving a memory that already
+moved is a no-op), so a crash between writing a snapshot and emptying the log
+is harmless.
+
+Several processes may share one store: writers hold FileLock while they catch
+up on the log, append and compact, and each MemoryLog remembers the byte
+offset it has read up to, so other processes' appends can be replayed
+incrementally.
+
+Snapshots that hold large numeric data (embeddings, vector indexes) use
+write_array_snapshot/read_array_snapshot: raw ``.npy`` arrays that load with
+np.memmap, plus a compact JSON header.
+"""
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # No advisory locks (Windows): a store must not be shared between processes
+    fcntl = None
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+def atomic_write_json(path: str, data, **json_kwargs):
+    """Write data as JSON to a temporary file and rename it over path.
+
+    Every call uses its own temporary file, so concurrent writers never
+    interleave; the last rename wins and readers only ever see a complete file.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, **json_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def write_array_snapshot(directory: str, name: str, header: Dict, arrays: Dict[str, np.ndarray]) -> Dict[str, str]:
+    """Replace the snapshot called name in directory and return the file name of each array.
+
+    Arrays are written to generation-numbered ``<name>.<generation>.<key>.npy``
+    files. The JSON header ``<name>.json`` that lists them is written last with
+    an atomic rename, so a reader never pairs a header with arrays from another
+    snapshot. Files of older generations are removed afterwards, except those
+    still memory-mapped where the OS forbids removing them (Windows): loaded
+    memories and indexes keep views of the previous generation, so those files
+    are left for a later call to remove.
+    """
+    header_path = os.path.join(directory, f"{name}.json")
+    generation = 0
+    if os.path.exists(header_path):
+        with open(header_path, 'r') as f:
+            generation = json.load(f).get('generation', -1) + 1
+
+    files = {}
+    for key, array in arrays.items():
+        files[key] = f"{name}.{generation}.{key}.npy"
+        with open(os.path.join(directory, files[key]), 'wb') as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+
+    atomic_write_json(header_path, dict(header, generation=generation, arrays=files), separators=(',', ':'))
+
+    current = set(files.values())
+    for path in glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(name)}.*.npy")):
+        if os.path.basename(path) not in current:
+            try:
+                os.remove(path)
+            except PermissionError:
+                pass  # Still mapped; retried by the next snapshot
+    return files
+
+
+def remove_array_snapshot(directory: str, name: str):
+    """Remove the snapshot called name from directory, if present (header first, so it is never half there)."""
+    header_path = os.path.join(directory, f"{name}.json")
+    if os.path.exists(header_path):
+        os.remove(header_path)
+    for path in glob.glob(os.path.join(glob.escape(directory), f"{glob.escape(name)}.*.npy")):
+        try:
+            os.remove(path)
+        except PermissionError:
+            pass  # Still mapped (Windows); write_array_snapshot removes it later
+
+
+def read_array_snapshot(directory: str, name: str, mmap: bool = True) -> Optional[Tuple[Dict, Dict[str, np.ndarray]]]:
+    """Return (header, arrays) of a snapshot written by write_array_snapshot, or None if absent.
+
+    With mmap=True arrays are read-only np.memmap views of the files, so
+    loading does not read or copy the data up front.
+    """
+    header_path = os.path.join(directory, f"{name}.json")
+    if not os.path.exists(header_path):
+        return None
+    with open(header_path, 'r') as f:
+        header = json.load(f)
+    arrays = {
+        key: np.load(os.path.join(directory, file_name), mmap_mode='r' if mmap else None)
+        for key, file_name in header['arrays'].items()
+    }
+    return header, arrays
+
+
+class FileLock:
+    """Exclusive advisory fcntl lock on a lock file, reentrant within a process.
+
+    Threads of one process share the lock: callers serialize them beforehand
+    (see rwlock), and nested acquisitions only count.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+        self._mutex = threading.Lock()
+
+    def __enter__(self):
+        with self._mutex:
+            if not self._depth:
+                if self._fd is None:
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._mutex:
+            self._depth -= 1
+            if not self._depth and fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class MemoryLog:
+    """JSON-lines log of memory mutations.
+
+    fsync policies:
+        'always'   - fsync after every record (survives power loss)
+        'interval' - fsync at most every ``fsync_interval`` seconds; a record is
+                     synced at most ``fsync_interval`` seconds after it was
+                     appended (by a timer if no append follows) or on close()
+        'never'    - leave syncing to the OS (survives process crashes only)
+    """
+
+    def __init__(self, path: str, fsync: str = 'interval', fsync_interval: float = 1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', expected one of {FSYNC_POLICIES}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.records = 0  # Records appended since the last compaction
+        self.offset = 0  # Bytes of the log read or written by this process
+        self._file = None
+        self._last_sync = time.monotonic()
+        self._unsynced = False
+        self._sync_timer: Optional[threading.Timer] = None
+        self._mutex = threading.Lock()  # The sync timer runs on its own thread
+
+    def append(self, record: Dict):
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict]):
+        """Append several records with a single write and at most one fsync."""
+        if not records:
+            return
+        data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        with self._mutex:
+            if self._file is None:
+                self._file = open(self.path, 'a')
+            self._file.write(data)
+            self._file.flush()
+            self._unsynced = True
+            self.records += len(records)
+            self.offset += len(data.encode('utf-8'))
+
+            elapsed = time.monotonic() - self._last_sync
+            if self.fsync == 'always' or (self.fsync == 'interval' and elapsed >= self.fsync_interval):
+                self._sync()
+            elif self.fsync == 'interval' and self._sync_timer is None:
+                # Bound the window even if no further append comes to trigger the sync
+                self._sync_timer = threading.Timer(self.fsync_interval - elapsed, self.sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+
+    def sync(self):
+        with self._mutex:
+            self._sync()
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = False
+        self._last_sync = time.monotonic()
+        self._cancel_timer()
+
+    def _cancel_timer(self):
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+
+    def replay(self, offset: int = 0) -> List[Dict]:
+        """Read all complete records after byte offset, truncating a torn record left by a crash.
+
+        offset is where an earlier replay stopped; afterwards self.offset is the
+        end of the last complete record.
+        """
+        records = []
+        if not os.path.exists(self.path):
+            self.records = 0
+            self.offset = 0
+            return records
+
+        valid_bytes = offset
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError("incomplete record")
+                    records.append(json.loads(line))
+                except ValueError as e:
+                    logging.warning(f"Discarding log tail of {self.path} after byte {valid_bytes}: {e}")
+                    break
+                valid_bytes += len(line)
+
+        if valid_bytes < os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(valid_bytes)
+
+        self.records = len(records) if offset == 0 else self.records + len(records)
+        self.offset = valid_bytes
+        return records
+
+    def reset(self):
+        """Empty the log once its records are part of a snapshot."""
+        self._close(sync=False)  # The records are about to be discarded
+        open(self.path, 'w').close()
+        self.records = 0
+        self.offset = 0
+
+    def close(self):
+        """Close the log file, syncing unsynced records unless the policy is 'never'."""
+        self._close(sync=self.fsync != 'never')
+
+    def _close(self, sync: bool):
+        with self._mutex:
+            if sync:
+                self._sync()
+            self._cancel_timer()
+            self._unsynced = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -1,23 +1,66 @@
 from dataclasses import dataclass
-from typing import List, Dict, Optional
+from typing import Deque, Iterator, List, Dict, Optional, Tuple
+from collections import deque
+from itertools import chain, count, islice
+import heapq
 import time
+from keyword_index import KeywordIndex
+from metrics import NULL_METRICS, Metrics, timed
+from rwlock import NULL_LOCK, ReadWriteLock, reads, writes
 
-@dataclass
+# Tier order of the original concatenated lists (core + recent + archival), used to break ties
+TIER_RANKS = {'core': 0, 'recent': 1, 'archival': 2}
+
+@dataclass(slots=True)
 class Memory:
     content: str
     timestamp: float
     importance: float
     context: str
     memory_type: str  # 'core', 'recent', 'archival'
+    memory_id: Optional[int] = None
 
 class MemoryManager:
-    def __init__(self, core_memory_size: int = 5, recent_memory_size: int = 10):
-        self.core_memories: List[Memory] = []
-        self.recent_memories: List[Memory] = []
-        self.archival_memories: List[Memory] = []
+    def __init__(self, core_memory_size: int = 5, recent_memory_size: int = 10, thread_safe: bool = False,
+                 metrics: Optional[Metrics] = None):
+        # Core tier is a min-heap of (importance, insertion order, memory), so the least
+        # important core memory (the oldest among equals) is evicted in O(log n)
+        self._core_heap: List[Tuple[float, int, Memory]] = []
+        self.recent_memories: Deque[Memory] = deque()
+        self.archival_memories: List[Memory] = []  # Append-only
         self.core_memory_size = core_memory_size
         self.recent_memory_size = recent_memory_size
+        self._memories_by_id: Dict[int, Memory] = {}
+        self.keyword_index = KeywordIndex()
+        # (tier rank, order of entering the tier) per memory id; within every tier
+        # memories are kept in the order they entered it
+        self._tier_order: Dict[int, Tuple[int, int]] = {}
+        self._tier_entries = count()
+        # Concurrent retrievals share the lock, mutations hold it exclusively
+        self._lock = ReadWriteLock() if thread_safe else NULL_LOCK
+        # Latencies, counts and tier sizes; NULL_METRICS records nothing
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.metrics.track('core_memories', lambda: len(self._core_heap))
+        self.metrics.track('recent_memories', lambda: len(self.recent_memories))
+        self.metrics.track('archival_memories', lambda: len(self.archival_memories))
+
+    @property
+    @reads
+    def core_memories(self) -> List[Memory]:
+        """Core memories in insertion order."""
+        return [memory for _, _, memory in sorted(self._core_heap, key=lambda entry: entry[1])]
+
+    @reads
+    def iter_memories(self) -> Iterator[Memory]:
+        """Iterate over core, recent and archival memories without copying the archival tier.
 
+        The iterator covers the memories present when it was created, so later adds do not break it.
+        """
+        archival = islice(self.archival_memories, len(self.archival_memories))  # Append-only
+        return chain(self.core_memories, list(self.recent_memories), archival)
+
+    @timed('add_seconds')
+    @writes
     def add_memory(self, content: str, importance: float, context: str) -> Memory:
         """Add a new memory to the appropriate storage based on importance."""
         memory = Memory(
@@ -25,47 +68,64 @@ class MemoryManager:
             timestamp=time.time(),
             importance=importance,
             context=context,
-            memory_type='recent'
+            memory_type='recent',
+            memory_id=len(self._memories_by_id)
         )
+        self._memories_by_id[memory.memory_id] = memory
+        self.keyword_index.add(memory.memory_id, content)
 
         if importance >= 0.8:  # High importance memories go to core
-            if len(self.core_memories) >= self.core_memory_size:
+            memory.memory_type = 'core'
+            entry = (importance, self._enter_tier(memory), memory)
+            if len(self._core_heap) >= self.core_memory_size:
                 # Move least important core memory to recent
-                least_important = min(self.core_memories, key=lambda x: x.importance)
-                self.core_memories.remove(least_important)
+                _, _, least_important = heapq.heapreplace(self._core_heap, entry)
                 least_important.memory_type = 'recent'
                 self._add_to_recent(least_important)
-            
-            memory.memory_type = 'core'
-            self.core_memories.append(memory)
+            else:
+                heapq.heappush(self._core_heap, entry)
         else:
             self._add_to_recent(memory)
 
+        self.metrics.increment('adds_total')
         return memory
 
+    def _enter_tier(self, memory: Memory) -> int:
+        """Record that memory was appended to the tier named by its memory_type."""
+        entry = next(self._tier_entries)
+        self._tier_order[memory.memory_id] = (TIER_RANKS[memory.memory_type], entry)
+        return entry
+
     def _add_to_recent(self, memory: Memory):
         """Add memory to recent storage, moving older ones to archival if needed."""
         self.recent_memories.append(memory)
+        self._enter_tier(memory)
         if len(self.recent_memories) > self.recent_memory_size:
-            oldest = self.recent_memories.pop(0)
+            oldest = self.recent_memories.popleft()
             oldest.memory_type = 'archival'
             self.archival_memories.append(oldest)
+            self._enter_tier(oldest)
 
-    def get_relevant_memories(self, query: str, top_k: int = 3) -> List[Memory]:
-        """Simple relevance-based memory retrieval (in a real implementation, this would use embeddings)."""
-        all_memories = self.core_memories + self.recent_memories + self.archival_memories
+    @timed('query_seconds')
+    @reads
+    def get_relevant_memories(self, query: str, top_k: int = 3, ranker: str = 'overlap') -> List[Memory]:
+        """Simple relevance-based memory retrieval (in a real implementation, this would use embeddings).
+
+        ranker is 'overlap' (shared keywords) or 'bm25'; ties go to the more important memory.
+        """
         # Simple keyword matching (in practice, use proper embedding similarity)
-        scored_memories = [
-            (memory, len(set(query.lower().split()) & set(memory.content.lower().split())))
-            for memory in all_memories
-        ]
-        scored_memories.sort(key=lambda x: (-x[1], -x[0].importance))
-        return [memory for memory, _ in scored_memories[:top_k]]
+        ids = self.keyword_index.search(query, top_k, self._tie_key, self._memories_by_id, ranker)
+        self.metrics.increment('queries_total')
+        return [self._memories_by_id[memory_id] for memory_id in ids]
+
+    def _tie_key(self, memory_id: int) -> Tuple:
+        return (-self._memories_by_id[memory_id].importance,) + self._tier_order[memory_id]
 
+    @reads
     def summarize_memory_state(self) -> Dict[str, int]:
         """Return a summary of the current memory state."""
         return {
-            'core_memories': len(self.core_memories),
+            'core_memories': len(self._core_heap),
             'recent_memories': len(self.recent_memories),
             'archival_memories': len(self.archival_memories)
         }
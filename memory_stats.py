@@ -0,0 +1,95 @@
+"""Running aggregates behind IntelligentMemoryManager.analyze_memory_patterns.
+
+MemoryStats is updated as memories are added and evicted, so an analysis
+costs O(k) in the number of distinct contexts, memory types and tags instead
+of a pass over every memory:
+
+    importance mean and std  Welford's online algorithm, which also removes values
+    importance median        sorted list of importances (bisect; insert and remove are a memmove)
+    distributions            Counters of contexts, memory types and tags
+
+The results match the pandas computation analyze_memory_patterns(rebuild=True)
+runs: std is the sample standard deviation (NaN for a single memory), and
+tied tag counts keep the order in which the tags were first seen.
+"""
+import math
+from bisect import bisect_left, insort
+from collections import Counter
+from itertools import chain
+from typing import Dict, Iterable, List
+
+
+class MemoryStats:
+    def __init__(self, memories: Iterable = ()):
+        # Built in bulk; add and remove keep it up to date afterwards
+        memories = list(memories)
+        importances = [memory.importance for memory in memories]
+        self.count = len(importances)
+        self._mean = sum(importances) / self.count if self.count else 0.0
+        self._m2 = sum((value - self._mean) ** 2 for value in importances)  # Sum of squared deviations from the mean
+        self._importances: List[float] = sorted(importances)
+        self.contexts = Counter(memory.context for memory in memories)
+        self.memory_types = Counter(memory.memory_type for memory in memories)
+        self.tags = Counter(chain.from_iterable(memory.tags or () for memory in memories))
+
+    def add(self, memory):
+        self.count += 1
+        delta = memory.importance - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (memory.importance - self._mean)
+        insort(self._importances, memory.importance)
+        self.contexts[memory.context] += 1
+        self.memory_types[memory.memory_type] += 1
+        self.tags.update(memory.tags or ())
+
+    def remove(self, memory):
+        """Remove a memory that was added with the same importance, context, type and tags."""
+        self.count -= 1
+        if self.count:
+            delta = memory.importance - self._mean
+            self._mean -= delta / self.count
+            self._m2 = max(self._m2 - delta * (memory.importance - self._mean), 0.0)
+        else:
+            self._mean = self._m2 = 0.0
+        del self._importances[bisect_left(self._importances, memory.importance)]
+        _discard(self.contexts, memory.context)
+        _discard(self.memory_types, memory.memory_type)
+        for tag in memory.tags or ():
+            _discard(self.tags, tag)
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.count else math.nan
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    @property
+    def median(self) -> float:
+        values = self._importances
+        if not values:
+            return math.nan
+        middle = len(values) // 2
+        return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+    def analysis(self, top_tags: int = 5) -> Dict:
+        """The analyze_memory_patterns dict, or {} if there are no memories."""
+        if not self.count:
+            return {}
+        return {
+            'importance_stats': {
+                'mean': self.mean,
+                'std': self.std,
+                'median': self.median
+            },
+            'context_distribution': dict(self.contexts.most_common()),
+            'memory_type_distribution': dict(self.memory_types.most_common()),
+            'common_tags': dict(self.tags.most_common(top_tags))
+        }
+
+
+def _discard(counter: Counter, key):
+    counter[key] -= 1
+    if not counter[key]:
+        del counter[key]
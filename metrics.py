@@ -0,0 +1,212 @@
+"""Latency histograms, counters and gauges for the memory managers.
+
+Managers created with ``metrics=Metrics()`` time their public operations and
+the stages of their hot paths into histograms, count adds, queries and
+evictions, and expose store sizes as gauges. Otherwise they use NULL_METRICS,
+whose methods do nothing, so disabled instrumentation costs a no-op call.
+
+Metrics.snapshot() returns a plain dict and Metrics.to_prometheus() the
+Prometheus text exposition format. With profile_rate > 0, that fraction of
+timed operations also runs under cProfile, and profile_stats() returns the
+accumulated pstats.Stats.
+
+Managers sharing one Metrics add up their counters and histograms; gauges
+and tracked values are per name, so the last manager registered wins.
+"""
+import cProfile
+import functools
+import io
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Optional, Sequence
+
+# Upper bounds (seconds) of the latency histogram buckets, as in the Prometheus client libraries
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+METRIC_KINDS = ('counter', 'gauge')
+
+
+class Histogram:
+    """Counts of observations per bucket, where bucket i holds values <= buckets[i]."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the largest bound if it is above it)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict:
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += bucket_count
+            buckets[_format_bound(bound)] = cumulative
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+def _format_bound(bound: float) -> str:
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+class Metrics:
+    def __init__(self, namespace: str = 'memgpt', buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 profile_rate: float = 0.0):
+        self.namespace = namespace
+        self.buckets = tuple(buckets)
+        self.profile_rate = profile_rate
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._tracked: Dict[str, tuple] = {}  # name -> (kind, read)
+        self._mutex = threading.Lock()  # Retrievals record metrics concurrently
+        self._profiler: Optional[cProfile.Profile] = None
+        self._profiling = False
+
+    def increment(self, name: str, amount: float = 1):
+        with self._mutex:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        with self._mutex:
+            self.gauges[name] = value
+
+    def track(self, name: str, read: Callable[[], float], kind: str = 'gauge'):
+        """Export read() as a counter or gauge, calling it at snapshot time."""
+        if kind not in METRIC_KINDS:
+            raise ValueError(f"Unknown metric kind '{kind}', expected one of {METRIC_KINDS}")
+        with self._mutex:
+            self._tracked[name] = (kind, read)
+
+    def observe(self, name: str, seconds: float):
+        with self._mutex:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Observe the duration of the block in histogram name, profiling a sample of blocks."""
+        profiler = self._start_profile() if self.profile_rate and random.random() < self.profile_rate else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+
+    def _start_profile(self) -> Optional[cProfile.Profile]:
+        with self._mutex:
+            if self._profiling:
+                return None  # A nested or concurrent block is already profiled
+            self._profiling = True
+            if self._profiler is None:
+                self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        return self._profiler
+
+    def profile_stats(self) -> Optional[pstats.Stats]:
+        """Accumulated cProfile statistics of the sampled blocks, or None if none was sampled."""
+        if self._profiler is None:
+            return None
+        return pstats.Stats(self._profiler, stream=io.StringIO())
+
+    def snapshot(self) -> Dict:
+        with self._mutex:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {name: histogram.snapshot() for name, histogram in self.histograms.items()}
+            tracked = dict(self._tracked)
+        for name, (kind, read) in tracked.items():
+            (counters if kind == 'counter' else gauges)[name] = read()
+        return {'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def to_prometheus(self) -> str:
+        """Render the snapshot in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for kind, values in (('counter', snapshot['counters']), ('gauge', snapshot['gauges'])):
+            for name, value in sorted(values.items()):
+                name = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {value}")
+        for name, histogram in sorted(snapshot['histograms'].items()):
+            name = f"{self.namespace}_{name}"
+            lines.append(f"# TYPE {name} histogram")
+            for bound, cumulative in histogram['buckets'].items():
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum {histogram['sum']}")
+            lines.append(f"{name}_count {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Drop recorded values and profiles; tracked values stay registered."""
+        with self._mutex:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self._profiler = None
+
+
+class _NullMetrics:
+    _context = nullcontext()
+
+    def increment(self, name, amount=1):
+        pass
+
+    def set_gauge(self, name, value):
+        pass
+
+    def track(self, name, read, kind='gauge'):
+        pass
+
+    def observe(self, name, seconds):
+        pass
+
+    def timer(self, name):
+        return self._context
+
+
+NULL_METRICS = _NullMetrics()
+
+
+def timed(name: str):
+    """Time a manager method into histogram name of its ``metrics``."""
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
@@ -1,12 +1,16 @@
-from persistent_memory import PersistentMemoryManager
+from persistent_memory import PersistentMemoryManager, create_memory_manager
 from datetime import datetime
 from typing import List, Optional, Dict
 import os
 
 class PersistentAIAssistant:
-    def __init__(self, name: str = "AI Assistant"):
+    def __init__(self, name: str = "AI Assistant", backend: str = 'json', storage_dir: str = "memory_storage",
+                 **memory_options):
+        """memory_options go to the memory manager, e.g. write_behind=5.0 to flush memories at most every 5 seconds."""
         self.name = name
-        self.memory_manager = PersistentMemoryManager()
+        self.memory_manager: PersistentMemoryManager = create_memory_manager(
+            backend, storage_dir=storage_dir, **memory_options
+        )
         self.current_context: Optional[str] = None
         
     def start_session(self, context: Optional[str] = None):
@@ -16,20 +20,25 @@ class PersistentAIAssistant:
         if context:
             session_start += f" with context: {context}"
         
-        self.memory_manager.add_memory(
-            content=session_start,
-            importance=0.7,
-            context="session_management"
-        )
-        
-        return self._generate_greeting()
+        with self.memory_manager.deferred():
+            self.memory_manager.add_memory(
+                content=session_start,
+                importance=0.7,
+                context="session_management"
+            )
+            
+            return self._generate_greeting()
+    
+    def end_session(self):
+        """Write any memories still buffered by the memory manager."""
+        self.memory_manager.flush()
     
     def _generate_greeting(self) -> str:
         """Generate a contextual greeting based on previous interactions."""
-        recent_sessions = self.memory_manager.get_memories_by_context("session_management")
+        recent_sessions = list(self.memory_manager.iter_memories(context="session_management", limit=2, reverse=True))
         
         if len(recent_sessions) > 1:
-            last_session = recent_sessions[-2]  # -1 would be current session
+            last_session = recent_sessions[1]  # [0] would be current session
             return f"Welcome back! I remember our last session on {datetime.fromtimestamp(last_session.timestamp).strftime('%Y-%m-%d')}. How can I assist you today?"
         
         return "Hello! I'm your AI assistant. I'll remember our conversation for future sessions. How can I help you?"
@@ -65,6 +74,11 @@ class PersistentAIAssistant:
     
     def process_input(self, user_input: str) -> str:
         """Process user input and generate a contextual response."""
+        # The turn's memories are persisted together, at most once
+        with self.memory_manager.deferred():
+            return self._process_input(user_input)
+    
+    def _process_input(self, user_input: str) -> str:
         # Extract preferences
         self._extract_user_preferences(user_input)
         
@@ -123,9 +137,8 @@ class PersistentAIAssistant:
 
         # Check for context-specific queries
         if self.current_context:
-            context_memories = self.memory_manager.get_memories_by_context(self.current_context)
-            if context_memories:
-                relevant_memory = context_memories[-1]  # Most recent memory in current context
+            relevant_memory = next(self.memory_manager.iter_memories(context=self.current_context, limit=1, reverse=True), None)
+            if relevant_memory is not None:  # Most recent memory in current context
                 return f"In our current {self.current_context} context, we were discussing: {relevant_memory.content}"
 
         # Get relevant memories for general queries
@@ -151,12 +164,13 @@ class PersistentAIAssistant:
                 "- 'Let's discuss [technical/personal] matters'"
             )
         
-        context_memories = self.memory_manager.get_memories_by_context(self.current_context)
+        # Last 3 memories in this context, oldest first
+        context_memories = list(self.memory_manager.iter_memories(context=self.current_context, limit=3, reverse=True))[::-1]
         summary = f"Current Context: {self.current_context.upper()}\n\n"
         
         if context_memories:
             summary += "Recent discussion points:\n"
-            for memory in context_memories[-3:]:  # Last 3 memories in this context
+            for memory in context_memories:
                 if 'User:' in memory.content:
                     # Clean up the memory content for display
                     content = memory.content.split('|')[0].replace('User:', '').strip()
@@ -170,7 +184,7 @@ class PersistentAIAssistant:
 
     def _format_memory_summary(self) -> str:
         """Format a summary of stored memories."""
-        recent_memories = self.memory_manager.get_session_memories()[-5:]  # Last 5 memories
+        recent_memories = list(self.memory_manager.iter_memories(limit=5, reverse=True))[::-1]  # Last 5 memories
         
         if not recent_memories:
             return "I don't have any memories stored yet. Let's create some by having a conversation!"
@@ -217,6 +231,7 @@ def main():
                 continue
                 
             if user_input.lower() == 'exit':
+                assistant.end_session()
                 print("\nAssistant: Goodbye! I'll remember our conversation for next time!")
                 break
             
@@ -224,6 +239,7 @@ def main():
             print(f"\nAssistant: {response}\n")
             
         except KeyboardInterrupt:
+            assistant.end_session()
             print("\nAssistant: Session ended. I'll remember our conversation!")
             break
         except Exception as e:
@@ -1,10 +1,28 @@
+import atexit
+import functools
 import json
 import os
+import signal
+import sys
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from dataclasses import asdict, dataclass
-from typing import Dict, List, Optional
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 from datetime import datetime
+from itertools import chain, count, islice
+from keyword_index import KeywordIndex
+from memory_log import FileLock, MemoryLog, atomic_write_json
+from memory_manager import TIER_RANKS
+from metrics import NULL_METRICS, Metrics, timed
+from rwlock import NULL_LOCK, ReadWriteLock, reads, writes
 
-@dataclass
+# String fields with few distinct values, interned on load
+_LABEL_FIELDS = frozenset(('context', 'memory_type', 'session_id'))
+
+@dataclass(slots=True)
 class PersistentMemory:
     content: str
     timestamp: float
@@ -12,21 +30,132 @@ class PersistentMemory:
     context: str
     memory_type: str
     session_id: str
+    memory_id: Optional[int] = None
     
     def to_dict(self):
         return asdict(self)
     
     @classmethod
     def from_dict(cls, data):
-        return cls(**data)
+        # Decoded JSON strings are fresh objects, one per memory
+        return cls(**{key: sys.intern(value) if key in _LABEL_FIELDS and isinstance(value, str) else value
+                      for key, value in data.items()})
+
+# Managers with buffered log records, flushed at interpreter exit
+_write_behind_managers: 'weakref.WeakSet[PersistentMemoryManager]' = weakref.WeakSet()
+_exit_hooks_installed = False
+
+def _flush_write_behind():
+    for manager in list(_write_behind_managers):
+        manager.flush()
+
+def _exit_on_sigterm(signum, frame):
+    sys.exit(128 + signum)  # Unwind normally, so atexit flushes the buffered records
+
+def _register_write_behind(manager: 'PersistentMemoryManager'):
+    """Flush manager at interpreter exit, including after SIGTERM if nothing else handles it."""
+    global _exit_hooks_installed
+    _write_behind_managers.add(manager)
+    if not _exit_hooks_installed:
+        _exit_hooks_installed = True
+        atexit.register(_flush_write_behind)
+        if (threading.current_thread() is threading.main_thread()
+                and signal.getsignal(signal.SIGTERM) is signal.SIG_DFL):
+            signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
+def _chronological_key(memory: PersistentMemory) -> Tuple[float, int]:
+    return (memory.timestamp, memory.memory_id)
+
+def _paginate(lists: Sequence[List], offset: int = 0, limit: Optional[int] = None,
+              reverse: bool = False) -> Iterator:
+    """Iterate over the concatenation of lists from position offset, without copying them."""
+    if reverse:
+        lists = lists[::-1]
+    parts = []
+    for items in lists:
+        if offset >= len(items):
+            offset -= len(items)
+            continue
+        indices = range(len(items) - 1 - offset, -1, -1) if reverse else range(offset, len(items))
+        parts.append(map(items.__getitem__, indices))
+        offset = 0
+    return islice(chain.from_iterable(parts), limit)
+
+def _fresh(method):
+    """Pick up changes other processes made to the store before running a read method."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._changed_on_disk():
+            self._refresh()
+        return method(self, *args, **kwargs)
+    return wrapper
 
 class PersistentMemoryManager:
-    def __init__(self, storage_dir: str = "memory_storage"):
+    """Tiered memories stored as a memories.json snapshot plus an append-only mutation log.
+    
+    Several processes can share one storage_dir: every write holds an advisory
+    lock on memories.lock, first replays what other processes appended to the
+    log (so memory ids and tier moves stay consistent), then appends its own
+    records. Compaction writes everyone's memories. Reads detect other
+    processes' writes from the log size and the snapshot's inode and mtime, and
+    replay only the new log records; a full reload happens only after another
+    process compacted.
+    
+    iter_memories and iter_chronological page through the store (or one session
+    or context) without copying it; the list APIs are built on them.
+    
+    Inside ``with manager.deferred():`` log records are buffered and written
+    once when the block ends. With write_behind (seconds) they stay buffered
+    across blocks and are written once flush_every records are pending,
+    write_behind seconds after the first of them, on flush(), or at interpreter
+    exit (SIGTERM included); that is the window in which a crash loses
+    mutations. Buffered records are invisible to other processes, so a
+    write-behind store must not be shared between processes.
+    """
+    
+    def __init__(self, storage_dir: str = "memory_storage", fsync: str = 'interval',
+                 compact_threshold: int = 1000, thread_safe: bool = False,
+                 metrics: Optional[Metrics] = None, write_behind: Optional[float] = None,
+                 flush_every: int = 100):
         self.storage_dir = storage_dir
+        # Concurrent retrievals share the lock, mutations and saves hold it exclusively;
+        # write_behind needs it too, since its flush timer runs on another thread
+        self._lock = ReadWriteLock() if thread_safe or write_behind is not None else NULL_LOCK
+        # Latencies, counts and tier sizes; NULL_METRICS records nothing
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self._track_tier_sizes()
         self.core_memories: List[PersistentMemory] = []
         self.recent_memories: List[PersistentMemory] = []
         self.archival_memories: List[PersistentMemory] = []
         self.current_session_id: str = self._generate_session_id()
+        self._next_memory_id = 0
+        self._memories_by_id: Dict[int, PersistentMemory] = {}
+        self.keyword_index = KeywordIndex()
+        # (tier rank, order of entering the tier) per memory id, to break ties in tier order
+        self._tier_order: Dict[int, Tuple[int, int]] = {}
+        self._tier_entries = count()
+        # Lowercase context / session_id -> memories per tier, each in tier order, and
+        # under 'chronological' all of them by (timestamp, memory_id)
+        self._by_context: Dict[str, Dict[str, List[PersistentMemory]]] = {}
+        self._by_session: Dict[str, Dict[str, List[PersistentMemory]]] = {}
+        self._chronological: List[PersistentMemory] = []
+        
+        # Mutations are appended to a log and compacted into memories.json once the
+        # log holds at least compact_threshold records and as many as the snapshot
+        self._log = MemoryLog(os.path.join(storage_dir, 'memories.log'), fsync=fsync)
+        self.compact_threshold = compact_threshold
+        self._file_lock = FileLock(os.path.join(storage_dir, 'memories.lock'))
+        self._snapshot_signature = None  # (inode, mtime) of the memories.json that was loaded
+        
+        # Log records not written yet (see deferred and write_behind)
+        self.write_behind = write_behind
+        self.flush_every = flush_every
+        self._pending: List[Dict] = []
+        self._pending_since = 0.0
+        self._defer_depth = 0
+        self._flush_timer: Optional[threading.Timer] = None
+        if write_behind is not None:
+            _register_write_behind(self)
         
         # Create storage directory if it doesn't exist
         os.makedirs(storage_dir, exist_ok=True)
@@ -35,16 +164,31 @@ class PersistentMemoryManager:
     def _generate_session_id(self) -> str:
         return datetime.now().strftime("%Y%m%d_%H%M%S")
     
+    def _track_tier_sizes(self):
+        self.metrics.track('core_memories', lambda: len(self.core_memories))
+        self.metrics.track('recent_memories', lambda: len(self.recent_memories))
+        self.metrics.track('archival_memories', lambda: len(self.archival_memories))
+    
+    @timed('add_seconds')
+    @writes
     def add_memory(self, content: str, importance: float, context: str) -> PersistentMemory:
+        with self._file_lock:
+            self._sync()
+            return self._add(content, importance, context)
+    
+    def _add(self, content: str, importance: float, context: str) -> PersistentMemory:
         memory = PersistentMemory(
             content=content,
             timestamp=datetime.now().timestamp(),
             importance=importance,
             context=context,
             memory_type='recent',
-            session_id=self.current_session_id
+            session_id=self.current_session_id,
+            memory_id=self._next_memory_id
         )
+        self._next_memory_id += 1
         
+        old_memory = None
         if importance >= 0.8:
             memory.memory_type = 'core'
             self.core_memories.append(memory)
@@ -56,50 +200,319 @@ class PersistentMemoryManager:
                 old_memory = self.recent_memories.pop(0)
                 old_memory.memory_type = 'archival'
                 self.archival_memories.append(old_memory)
+                self._archive(old_memory)
+        self._index(memory)
         
-        # Save after each new memory
-        self.save_memories()
+        # Log the new memory and any tier move
+        records = [{'op': 'add', 'memory': memory.to_dict()}]
+        if old_memory is not None:
+            records.append({'op': 'move', 'memory_id': old_memory.memory_id, 'memory_type': 'archival'})
+        self._log_records(records)
+        self.metrics.increment('adds_total')
+        self._maybe_compact()
         return memory
     
+    @_fresh
+    @reads
     def get_memories_by_context(self, context: str) -> List[PersistentMemory]:
-        all_memories = self.core_memories + self.recent_memories + self.archival_memories
-        return [m for m in all_memories if m.context.lower() == context.lower()]
+        return list(self._iter_tiers(context=context))
     
+    @_fresh
+    @reads
     def get_session_memories(self, session_id: Optional[str] = None) -> List[PersistentMemory]:
-        all_memories = self.core_memories + self.recent_memories + self.archival_memories
+        return list(self._iter_tiers(session_id or None))
+    
+    @_fresh
+    @reads
+    def iter_memories(self, session_id: Optional[str] = None, context: Optional[str] = None, offset: int = 0,
+                      limit: Optional[int] = None, reverse: bool = False) -> Iterator[PersistentMemory]:
+        """Iterate over memories in the order of get_session_memories, optionally of one session and/or context.
+        
+        Skips offset memories and stops after limit; reverse starts from the end,
+        so limit=5, reverse=True gives the last five. The iterator reads the live
+        tiers: consume it before adding memories, or use the list APIs.
+        """
+        return self._iter_tiers(session_id, context, offset, limit, reverse)
+    
+    @_fresh
+    @reads
+    def iter_chronological(self, session_id: Optional[str] = None, context: Optional[str] = None,
+                           cursor: Optional[PersistentMemory] = None, limit: Optional[int] = None,
+                           reverse: bool = False) -> Iterator[PersistentMemory]:
+        """Iterate over memories by timestamp (newest first with reverse), optionally of one session and/or context.
+        
+        Keyset pagination: pass the last memory of the previous page as cursor to
+        continue after it. Like iter_memories, the iterator reads live lists.
+        """
+        items = self._chronological_list(session_id, context)
+        if cursor is None:
+            indices = range(len(items) - 1, -1, -1) if reverse else range(len(items))
+        elif reverse:
+            indices = range(bisect_left(items, _chronological_key(cursor), key=_chronological_key) - 1, -1, -1)
+        else:
+            indices = range(bisect_right(items, _chronological_key(cursor), key=_chronological_key), len(items))
+        memories = map(items.__getitem__, indices)
+        if session_id and context:
+            memories = self._in_context(memories, context)
+        return islice(memories, limit)
+    
+    def _iter_tiers(self, session_id: Optional[str] = None, context: Optional[str] = None, offset: int = 0,
+                    limit: Optional[int] = None, reverse: bool = False) -> Iterator[PersistentMemory]:
+        if session_id and context:
+            memories = self._in_context(self._iter_tiers(session_id, reverse=reverse), context)
+            return islice(memories, offset, None if limit is None else offset + limit)
         if session_id:
-            return [m for m in all_memories if m.session_id == session_id]
-        return all_memories
+            bucket = self._by_session.get(session_id)
+        elif context is not None:
+            bucket = self._by_context.get(context.lower())
+        else:
+            bucket = {'core': self.core_memories, 'recent': self.recent_memories, 'archival': self.archival_memories}
+        if bucket is None:
+            return iter(())
+        return _paginate((bucket['core'], bucket['recent'], bucket['archival']), offset, limit, reverse)
+    
+    def _chronological_list(self, session_id: Optional[str], context: Optional[str]) -> List[PersistentMemory]:
+        if session_id:
+            bucket = self._by_session.get(session_id)
+        elif context is not None:
+            bucket = self._by_context.get(context.lower())
+        else:
+            return self._chronological
+        return bucket['chronological'] if bucket is not None else []
+    
+    @staticmethod
+    def _in_context(memories: Iterator[PersistentMemory], context: str) -> Iterator[PersistentMemory]:
+        context = context.lower()
+        return (m for m in memories if m.context.lower() == context)
+    
+    @timed('query_seconds')
+    @_fresh
+    @reads
+    def get_relevant_memories(self, query: str, top_k: int = 3, ranker: str = 'overlap') -> List[PersistentMemory]:
+        """Keyword retrieval ('overlap' or 'bm25' ranker); ties go to the more important memory."""
+        # Simple keyword matching (could be enhanced with embeddings)
+        ids = self.keyword_index.search(query, top_k, self._tie_key, self._memories_by_id, ranker)
+        self.metrics.increment('queries_total')
+        return [self._memories_by_id[memory_id] for memory_id in ids]
     
-    def get_relevant_memories(self, query: str, top_k: int = 3) -> List[PersistentMemory]:
+    def _tie_key(self, memory_id: int) -> Tuple:
+        return (-self._memories_by_id[memory_id].importance,) + self._tier_order[memory_id]
+    
+    def _enter_tier(self, memory: PersistentMemory):
+        """Record that memory was appended to the tier named by its memory_type."""
+        self._tier_order[memory.memory_id] = (TIER_RANKS[memory.memory_type], next(self._tier_entries))
+    
+    def _index(self, memory: PersistentMemory, chronological: bool = True):
+        self._memories_by_id[memory.memory_id] = memory
+        self.keyword_index.add(memory.memory_id, memory.content)
+        lists = [self._chronological]
+        for buckets, key in ((self._by_context, memory.context.lower()), (self._by_session, memory.session_id)):
+            bucket = buckets.setdefault(key, {'core': [], 'recent': [], 'archival': [], 'chronological': []})
+            bucket[memory.memory_type].append(memory)
+            lists.append(bucket['chronological'])
+        if chronological:
+            # New memories are normally the newest, so this is an append
+            key = _chronological_key(memory)
+            for items in lists:
+                if not items or _chronological_key(items[-1]) <= key:
+                    items.append(memory)
+                else:
+                    insort(items, memory, key=_chronological_key)
+        self._enter_tier(memory)
+    
+    def _archive(self, memory: PersistentMemory):
+        """Update the indexes after memory moved from the recent tier to archival."""
+        for bucket in (self._by_context[memory.context.lower()], self._by_session[memory.session_id]):
+            recent = bucket['recent']
+            del recent[next(i for i, m in enumerate(recent) if m is memory)]
+            bucket['archival'].append(memory)
+        self._enter_tier(memory)
+    
+    def _reindex(self):
+        """Rebuild the keyword index and tier order from the tier lists."""
+        self._memories_by_id.clear()
+        self.keyword_index.clear()
+        self._tier_order.clear()
+        self._by_context.clear()
+        self._by_session.clear()
         all_memories = self.core_memories + self.recent_memories + self.archival_memories
+        for memory in all_memories:
+            self._index(memory, chronological=False)
+        self._chronological = sorted(all_memories, key=_chronological_key)
+        for bucket in chain(self._by_context.values(), self._by_session.values()):
+            bucket['chronological'] = sorted(bucket['core'] + bucket['recent'] + bucket['archival'],
+                                             key=_chronological_key)
+    
+    def _tier(self, memory_type: str) -> List[PersistentMemory]:
+        return {
+            'core': self.core_memories,
+            'recent': self.recent_memories,
+            'archival': self.archival_memories,
+        }[memory_type]
+    
+    def _log_records(self, records: List[Dict]):
+        if not self._pending:
+            self._pending_since = time.monotonic()
+        self._pending.extend(records)
+        if not self._defer_depth:
+            self._flush_if_due()
+    
+    def _flush_if_due(self):
+        if not self._pending:
+            return
+        waited = time.monotonic() - self._pending_since
+        if self.write_behind is None or len(self._pending) >= self.flush_every or waited >= self.write_behind:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.write_behind - waited, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+    
+    def _flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if self._pending:
+            self._log.append_many(self._pending)
+            self._pending = []
+            self.metrics.increment('log_flushes_total')
+    
+    @writes
+    def flush(self):
+        """Write buffered log records to memories.log now."""
+        with self._file_lock:
+            self._flush()
+    
+    @contextmanager
+    def deferred(self):
+        """Buffer the log records of the block and write them at most once, when it ends.
         
-        # Simple keyword matching (could be enhanced with embeddings)
-        scored_memories = [
-            (memory, len(set(query.lower().split()) & set(memory.content.lower().split())))
-            for memory in all_memories
-        ]
-        scored_memories.sort(key=lambda x: (-x[1], -x[0].importance))
-        return [memory for memory, _ in scored_memories[:top_k]]
+        The block holds the manager (and the store, across processes), so its
+        mutations reach memories.log together.
+        """
+        with self._lock.write(), self._file_lock:
+            self._defer_depth += 1
+            try:
+                yield self
+            finally:
+                self._defer_depth -= 1
+                if not self._defer_depth:
+                    self._flush_if_due()
     
+    def _maybe_compact(self):
+        total = len(self.core_memories) + len(self.recent_memories) + len(self.archival_memories)
+        if self._log.records + len(self._pending) >= max(self.compact_threshold, total):
+            self.metrics.increment('compactions_total')
+            self.save_memories()
+    
+    @timed('save_seconds')
+    @writes
     def save_memories(self):
-        memory_data = {
-            'core': [m.to_dict() for m in self.core_memories],
-            'recent': [m.to_dict() for m in self.recent_memories],
-            'archival': [m.to_dict() for m in self.archival_memories],
-        }
-        
-        with open(os.path.join(self.storage_dir, 'memories.json'), 'w') as f:
-            json.dump(memory_data, f, indent=2)
+        """Write a full snapshot to memories.json and empty the mutation log."""
+        with self._file_lock:
+            self._sync()  # Include what other processes logged since our last look
+            memory_data = {
+                'core': [m.to_dict() for m in self.core_memories],
+                'recent': [m.to_dict() for m in self.recent_memories],
+                'archival': [m.to_dict() for m in self.archival_memories],
+            }
+            
+            atomic_write_json(self._snapshot_path(), memory_data, indent=2)
+            self._log.reset()
+            self._pending = []  # The snapshot holds the buffered mutations
+            self._snapshot_signature = self._snapshot_stat()
+    
+    def _apply(self, record: Dict):
+        """Replay one logged mutation; records already reflected in the snapshot are skipped."""
+        if record['op'] == 'add':
+            memory = PersistentMemory.from_dict(record['memory'])
+            if memory.memory_id not in self._memories_by_id:
+                self._tier(memory.memory_type).append(memory)
+                self._index(memory)
+                self._next_memory_id = max(self._next_memory_id, memory.memory_id + 1)
+        elif record['op'] == 'move':
+            for i, memory in enumerate(self.recent_memories):
+                if memory.memory_id == record['memory_id']:
+                    del self.recent_memories[i]
+                    memory.memory_type = record['memory_type']
+                    self._tier(memory.memory_type).append(memory)
+                    self._archive(memory)
+                    break
     
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.storage_dir, 'memories.json')
+    
+    def _snapshot_stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self._snapshot_path())
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+    
+    def _changed_on_disk(self) -> bool:
+        """Whether another process logged or compacted since we last read the store."""
+        try:
+            log_size = os.path.getsize(self._log.path)
+        except FileNotFoundError:
+            log_size = 0
+        return log_size != self._log.offset or self._snapshot_stat() != self._snapshot_signature
+    
+    @timed('refresh_seconds')
+    @writes
+    def _refresh(self):
+        with self._file_lock:
+            self._sync()
+    
+    def _sync(self):
+        """Catch up with the store on disk; the caller holds the file lock."""
+        if self._snapshot_stat() != self._snapshot_signature:
+            self._load()  # Another process compacted the log into a new snapshot
+        else:
+            for record in self._log.replay(self._log.offset):
+                self._apply(record)
+    
+    @timed('load_seconds')
+    @writes
     def load_memories(self):
-        memory_file = os.path.join(self.storage_dir, 'memories.json')
-        if not os.path.exists(memory_file):
-            return
+        """Load the last snapshot, then replay the mutation log on top of it."""
+        with self._file_lock:
+            self._load()
+    
+    def _load(self):
+        self.core_memories, self.recent_memories, self.archival_memories = [], [], []
+        self._snapshot_signature = self._snapshot_stat()
+        if self._snapshot_signature is not None:
+            with open(self._snapshot_path(), 'r') as f:
+                memory_data = json.load(f)
+            
+            self.core_memories = [PersistentMemory.from_dict(m) for m in memory_data.get('core', [])]
+            self.recent_memories = [PersistentMemory.from_dict(m) for m in memory_data.get('recent', [])]
+            self.archival_memories = [PersistentMemory.from_dict(m) for m in memory_data.get('archival', [])]
+        
+        all_memories = self.core_memories + self.recent_memories + self.archival_memories
+        self._next_memory_id = max((m.memory_id for m in all_memories if m.memory_id is not None), default=-1) + 1
+        
+        # Stores written before the log existed have no ids; assign them and persist
+        unnumbered = [m for m in all_memories if m.memory_id is None]
+        for memory in unnumbered:
+            memory.memory_id = self._next_memory_id
+            self._next_memory_id += 1
         
-        with open(memory_file, 'r') as f:
-            memory_data = json.load(f)
+        self._reindex()
+        for record in self._log.replay():
+            self._apply(record)
         
-        self.core_memories = [PersistentMemory.from_dict(m) for m in memory_data.get('core', [])]
-        self.recent_memories = [PersistentMemory.from_dict(m) for m in memory_data.get('recent', [])]
-        self.archival_memories = [PersistentMemory.from_dict(m) for m in memory_data.get('archival', [])]
+        if unnumbered:
+            self.save_memories()
+
+
+BACKENDS = ('json', 'sqlite')
+
+def create_memory_manager(backend: str = 'json', **kwargs) -> PersistentMemoryManager:
+    """Create a PersistentMemoryManager storing memories as JSON ('json') or in SQLite ('sqlite')."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+    if backend == 'sqlite':
+        from sqlite_memory import SQLiteMemoryManager
+        return SQLiteMemoryManager(**kwargs)
+    return PersistentMemoryManager(**kwargs)
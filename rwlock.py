@@ -0,0 +1,102 @@
+"""Reader/writer lock for sharing a memory manager between threads.
+
+Managers created with ``thread_safe=True`` guard their methods with a
+ReadWriteLock: retrievals take the read side and run in parallel, mutations
+and saves take the write side and run one at a time. Otherwise they use
+NULL_LOCK, which costs next to nothing.
+
+Both sides are reentrant (add_memory calls add_memories, which may call
+save_memories), and the writing thread may also take the read side. A reader
+must not try to take the write side.
+"""
+import functools
+import threading
+from contextlib import contextmanager, nullcontext
+
+
+class ReadWriteLock:
+    """Writer-preferring reader/writer lock: new readers wait while a writer is waiting."""
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None  # Ident of the thread holding the write side
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()  # Read depth of the current thread
+
+    @contextmanager
+    def read(self):
+        depth = getattr(self._local, 'depth', 0)
+        if depth or self._writer == threading.get_ident():
+            # Nested read, or the writer reading what it is writing
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me:
+                self._waiting_writers += 1
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+                self._waiting_writers -= 1
+                self._writer = me
+            self._write_depth += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._condition.notify_all()
+
+
+class _NullLock:
+    _context = nullcontext()
+
+    def read(self):
+        return self._context
+
+    def write(self):
+        return self._context
+
+
+NULL_LOCK = _NullLock()
+
+
+def reads(method):
+    """Run a manager method under the read side of its ``_lock``."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def writes(method):
+    """Run a manager method under the write side of its ``_lock``."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock.write():
+            return method(self, *args, **kwargs)
+    return wrapper
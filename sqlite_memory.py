@@ -0,0 +1,359 @@
+"""SQLite storage engine for PersistentMemoryManager.
+
+SQLiteMemoryManager has the public API of PersistentMemoryManager but keeps
+memories in ``memories.db`` (WAL mode) instead of in-memory lists and
+memories.json. Only the recent tier (at most ten memories) is held in RAM;
+context, session and keyword lookups are SQL queries on indexed columns, and a
+move to archival is a single UPDATE. iter_memories and iter_chronological page
+with LIMIT/OFFSET and keyset conditions and stream rows from the cursor.
+
+Each thread uses its own connection, so with thread_safe=True retrievals run
+in parallel on WAL snapshots while writes are serialized.
+
+Several processes can share memories.db: add_memory runs in a BEGIN IMMEDIATE
+transaction, and when PRAGMA data_version shows that another connection
+committed in the meantime it first reloads the next memory id, tier sequence
+and recent tier. Reads are SQL queries and always see the latest commit.
+Inside ``with manager.deferred():`` the adds share one transaction, committed
+once when the block ends. Outside one every add is committed, so the
+write_behind and flush_every options of the JSON backend are accepted and
+ignored.
+
+Keyword retrieval uses a ``tokens`` table (token -> memory id, term frequency),
+the SQL counterpart of keyword_index.KeywordIndex, with the same scores and
+tie-breaking as the in-memory manager.
+"""
+import functools
+import heapq
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from itertools import starmap
+from typing import Iterator, List, Optional, Tuple
+
+from keyword_index import RANKERS, bm25_term, tokenize
+from memory_manager import TIER_RANKS
+from memory_log import FSYNC_POLICIES
+from metrics import NULL_METRICS, Metrics, timed
+from persistent_memory import PersistentMemory, PersistentMemoryManager
+from rwlock import NULL_LOCK, ReadWriteLock, reads, writes
+
+# Columns in PersistentMemory field order, so rows map to PersistentMemory(*row)
+_COLUMNS = "m.content, m.timestamp, m.importance, m.context, m.memory_type, m.session_id, m.memory_id"
+
+# Durability of each fsync policy; in WAL mode NORMAL survives process crashes
+_SYNCHRONOUS = {'always': 'FULL', 'interval': 'NORMAL', 'never': 'OFF'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    memory_id INTEGER PRIMARY KEY,
+    content TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    importance REAL NOT NULL,
+    context TEXT NOT NULL,
+    context_key TEXT NOT NULL,
+    memory_type TEXT NOT NULL,
+    tier_rank INTEGER NOT NULL,
+    tier_seq INTEGER NOT NULL,
+    session_id TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS memories_tier ON memories (tier_rank, tier_seq);
+CREATE INDEX IF NOT EXISTS memories_context ON memories (context_key, tier_rank, tier_seq);
+CREATE INDEX IF NOT EXISTS memories_session ON memories (session_id, tier_rank, tier_seq);
+CREATE INDEX IF NOT EXISTS memories_timestamp ON memories (timestamp);
+CREATE INDEX IF NOT EXISTS memories_context_time ON memories (context_key, timestamp);
+CREATE INDEX IF NOT EXISTS memories_session_time ON memories (session_id, timestamp);
+CREATE INDEX IF NOT EXISTS memories_importance ON memories (importance);
+CREATE TABLE IF NOT EXISTS tokens (
+    token TEXT NOT NULL,
+    memory_id INTEGER NOT NULL,
+    frequency INTEGER NOT NULL,
+    PRIMARY KEY (token, memory_id)
+) WITHOUT ROWID;
+"""
+
+# Memories in the order of the original concatenated tiers (core + recent + archival)
+_TIER_ORDER = "m.tier_rank, m.tier_seq"
+_TIER_ORDER_DESC = "m.tier_rank DESC, m.tier_seq DESC"
+
+
+class SQLiteMemoryManager(PersistentMemoryManager):
+    def __init__(self, storage_dir: str = "memory_storage", fsync: str = 'interval', thread_safe: bool = False,
+                 metrics: Optional[Metrics] = None, write_behind: Optional[float] = None,
+                 flush_every: int = 100):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', expected one of {FSYNC_POLICIES}")
+        self.storage_dir = storage_dir
+        self.fsync = fsync
+        self.current_session_id: str = self._generate_session_id()
+        self._recent: List[PersistentMemory] = []  # Working set: the recent tier, oldest first
+        self._lock = ReadWriteLock() if thread_safe else NULL_LOCK
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self._track_tier_sizes()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+
+        os.makedirs(storage_dir, exist_ok=True)
+        with self._db:
+            self._db.executescript(_SCHEMA)
+        self.load_memories()
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        """The calling thread's connection to memories.db."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(os.path.join(self.storage_dir, 'memories.db'), check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(f"PRAGMA synchronous={_SYNCHRONOUS[self.fsync]}")
+            self._local.db = db
+            self._connections.append(db)
+        return db
+
+    def _track_tier_sizes(self):
+        for tier, rank in TIER_RANKS.items():
+            self.metrics.track(f'{tier}_memories', functools.partial(self._count_tier, rank))
+
+    def _count_tier(self, tier_rank: int) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM memories WHERE tier_rank = ?", (tier_rank,)).fetchone()[0]
+
+    @property
+    @reads
+    def core_memories(self) -> List[PersistentMemory]:
+        return self._select("WHERE m.tier_rank = 0")
+
+    @property
+    @reads
+    def recent_memories(self) -> List[PersistentMemory]:
+        return self._select("WHERE m.tier_rank = 1")
+
+    @property
+    @reads
+    def archival_memories(self) -> List[PersistentMemory]:
+        return self._select("WHERE m.tier_rank = 2")
+
+    def _select(self, where: str = "", params: Tuple = (), order_by: str = _TIER_ORDER,
+                limit: Optional[int] = None) -> List[PersistentMemory]:
+        return list(self._query(where, params, order_by, limit))
+
+    def _query(self, where: str = "", params: Tuple = (), order_by: str = _TIER_ORDER,
+               limit: Optional[int] = None, offset: int = 0) -> Iterator[PersistentMemory]:
+        """Memories of a SELECT, read from the cursor as they are consumed."""
+        sql = f"SELECT {_COLUMNS} FROM memories m {where} ORDER BY {order_by}"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params = (*params, -1 if limit is None else limit, offset)
+        return starmap(PersistentMemory, self._db.execute(sql, params))
+
+    @timed('add_seconds')
+    @writes
+    def add_memory(self, content: str, importance: float, context: str) -> PersistentMemory:
+        if getattr(self._local, 'deferring', False):
+            return self._add(content, importance, context)
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._sync()
+            return self._add(content, importance, context)
+
+    @contextmanager
+    def deferred(self):
+        """Run the adds of the block in one transaction, committed when it ends."""
+        with self._lock.write():
+            if getattr(self._local, 'deferring', False):
+                yield self
+                return
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._sync()
+                self._local.deferring = True
+                try:
+                    yield self
+                finally:
+                    self._local.deferring = False
+
+    def flush(self):
+        """Nothing is buffered outside a deferred block: every add is committed."""
+
+    def _add(self, content: str, importance: float, context: str) -> PersistentMemory:
+        memory = PersistentMemory(
+            content=content,
+            timestamp=datetime.now().timestamp(),
+            importance=importance,
+            context=context,
+            memory_type='core' if importance >= 0.8 else 'recent',
+            session_id=self.current_session_id,
+            memory_id=self._next_memory_id
+        )
+        self._next_memory_id += 1
+
+        self._insert(memory)
+        if memory.memory_type == 'recent':
+            self._recent.append(memory)
+
+            # Move older memories to archival
+            if len(self._recent) > 10:
+                old_memory = self._recent.pop(0)
+                old_memory.memory_type = 'archival'
+                self._db.execute(
+                    "UPDATE memories SET memory_type = ?, tier_rank = ?, tier_seq = ? WHERE memory_id = ?",
+                    ('archival', TIER_RANKS['archival'], self._next_tier_seq(), old_memory.memory_id)
+                )
+        self.metrics.increment('adds_total')
+        return memory
+
+    def _sync(self):
+        """Reload the in-memory state if another connection committed since this one last looked."""
+        (version,) = self._db.execute("PRAGMA data_version").fetchone()
+        if version != getattr(self._local, 'data_version', None):
+            self._load_state()
+            self._local.data_version = version
+
+    def _load_state(self):
+        self._next_memory_id, self._tier_seq = self._db.execute(
+            "SELECT (SELECT COALESCE(MAX(memory_id), -1) + 1 FROM memories), "
+            "MAX((SELECT COALESCE(MAX(tier_seq), -1) + 1 FROM memories WHERE tier_rank = 0), "
+            "(SELECT COALESCE(MAX(tier_seq), -1) + 1 FROM memories WHERE tier_rank = 1), "
+            "(SELECT COALESCE(MAX(tier_seq), -1) + 1 FROM memories WHERE tier_rank = 2))"
+        ).fetchone()
+        self._recent = self._select("WHERE m.tier_rank = 1")
+
+    def _next_tier_seq(self) -> int:
+        seq = self._tier_seq
+        self._tier_seq += 1
+        return seq
+
+    def _insert(self, memory: PersistentMemory):
+        tokens = tokenize(memory.content)
+        self._db.execute(
+            "INSERT INTO memories VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (memory.memory_id, memory.content, memory.timestamp, memory.importance, memory.context,
+             memory.context.lower(), memory.memory_type, TIER_RANKS[memory.memory_type],
+             self._next_tier_seq(), memory.session_id, len(tokens))
+        )
+        self._db.executemany(
+            "INSERT INTO tokens VALUES (?, ?, ?)",
+            [(token, memory.memory_id, frequency) for token, frequency in Counter(tokens).items()]
+        )
+
+    @reads
+    def get_memories_by_context(self, context: str) -> List[PersistentMemory]:
+        return list(self.iter_memories(context=context))
+
+    @reads
+    def get_session_memories(self, session_id: Optional[str] = None) -> List[PersistentMemory]:
+        return list(self.iter_memories(session_id))
+
+    @reads
+    def iter_memories(self, session_id: Optional[str] = None, context: Optional[str] = None, offset: int = 0,
+                      limit: Optional[int] = None, reverse: bool = False) -> Iterator[PersistentMemory]:
+        where, params = self._filter(session_id, context)
+        return self._query(where, params, _TIER_ORDER_DESC if reverse else _TIER_ORDER, limit, offset)
+
+    @reads
+    def iter_chronological(self, session_id: Optional[str] = None, context: Optional[str] = None,
+                           cursor: Optional[PersistentMemory] = None, limit: Optional[int] = None,
+                           reverse: bool = False) -> Iterator[PersistentMemory]:
+        where, params = self._filter(session_id, context)
+        if cursor is not None:
+            where += (" AND " if where else "WHERE ") + f"(m.timestamp, m.memory_id) {'<' if reverse else '>'} (?, ?)"
+            params = (*params, cursor.timestamp, cursor.memory_id)
+        order_by = "m.timestamp DESC, m.memory_id DESC" if reverse else "m.timestamp, m.memory_id"
+        return self._query(where, params, order_by, limit)
+
+    @staticmethod
+    def _filter(session_id: Optional[str], context: Optional[str]) -> Tuple[str, Tuple]:
+        conditions, params = [], ()
+        if session_id:
+            conditions.append("m.session_id = ?")
+            params += (session_id,)
+        if context is not None:
+            conditions.append("m.context_key = ?")
+            params += (context.lower(),)
+        return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    @timed('query_seconds')
+    @reads
+    def get_relevant_memories(self, query: str, top_k: int = 3, ranker: str = 'overlap') -> List[PersistentMemory]:
+        """Keyword retrieval ('overlap' or 'bm25' ranker); ties go to the more important memory."""
+        if ranker not in RANKERS:
+            raise ValueError(f"Unknown ranker '{ranker}', expected one of {RANKERS}")
+        terms = list(set(tokenize(query)))
+        placeholders = ', '.join('?' * len(terms))
+
+        if ranker == 'overlap':
+            ranked = self._db.execute(
+                f"SELECT {_COLUMNS} FROM tokens t JOIN memories m ON m.memory_id = t.memory_id "
+                f"WHERE t.token IN ({placeholders}) GROUP BY m.memory_id "
+                f"ORDER BY COUNT(*) DESC, m.importance DESC, {_TIER_ORDER} LIMIT ?",
+                (*terms, top_k)
+            ).fetchall()
+            results = [PersistentMemory(*row) for row in ranked]
+        else:
+            results = self._bm25(terms, placeholders, top_k)
+
+        # Too few matches: fill with non-matching memories, as a full sort would
+        if len(results) < top_k:
+            results += self._select(
+                f"WHERE m.memory_id NOT IN (SELECT memory_id FROM tokens WHERE token IN ({placeholders}))",
+                tuple(terms), order_by=f"m.importance DESC, {_TIER_ORDER}", limit=top_k - len(results)
+            )
+        self.metrics.increment('queries_total')
+        return results
+
+    def _bm25(self, terms: List[str], placeholders: str, top_k: int) -> List[PersistentMemory]:
+        n_docs, total_length = self._db.execute("SELECT COUNT(*), TOTAL(length) FROM memories").fetchone()
+        mean_length = total_length / n_docs if n_docs else 0.0
+        postings = self._db.execute(
+            "SELECT t.token, t.memory_id, t.frequency, m.length, m.importance, m.tier_rank, m.tier_seq "
+            f"FROM tokens t JOIN memories m ON m.memory_id = t.memory_id WHERE t.token IN ({placeholders})",
+            terms
+        ).fetchall()
+
+        doc_freq = Counter(token for token, *_ in postings)
+        scores, tie_keys = {}, {}
+        for token, memory_id, frequency, length, importance, tier_rank, tier_seq in postings:
+            term = bm25_term(frequency, length, doc_freq[token], n_docs, mean_length)
+            scores[memory_id] = scores.get(memory_id, 0.0) + term
+            tie_keys[memory_id] = (-importance, tier_rank, tier_seq)
+        top = heapq.nsmallest(top_k, scores, key=lambda memory_id: (-scores[memory_id],) + tie_keys[memory_id])
+
+        placeholders = ', '.join('?' * len(top))
+        by_id = {m.memory_id: m for m in self._select(f"WHERE m.memory_id IN ({placeholders})", tuple(top))}
+        return [by_id[memory_id] for memory_id in top]
+
+    @timed('save_seconds')
+    @writes
+    def save_memories(self):
+        """Checkpoint the write-ahead log into memories.db; every add is already committed."""
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    @timed('load_seconds')
+    @writes
+    def load_memories(self):
+        """Load the recent tier, importing an existing memories.json store into an empty database."""
+        with self._db:
+            self._db.execute("BEGIN IMMEDIATE")  # Only one process imports
+            (count,) = self._db.execute("SELECT COUNT(*) FROM memories").fetchone()
+            if count == 0 and any(os.path.exists(os.path.join(self.storage_dir, name))
+                                  for name in ('memories.json', 'memories.log')):
+                self._import_json_store()
+            self._load_state()
+
+    def _import_json_store(self):
+        legacy = PersistentMemoryManager(self.storage_dir)
+        memories = legacy.get_session_memories()
+        self._tier_seq = 0
+        for memory in memories:
+            self._insert(memory)
+        logging.info(f"Imported {len(memories)} memories from {self.storage_dir}/memories.json into SQLite")
+
+    def close(self):
+        for db in self._connections:
+            db.close()
+        self._connections.clear()
+        self._local = threading.local()
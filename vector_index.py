@@ -0,0 +1,513 @@
+"""Vector indexes for semantic memory search.
+
+Every index stores unit-length float32 vectors keyed by integer memory id and
+answers cosine-similarity top-k queries:
+
+- FlatIndex scans every vector (exact).
+- IVFIndex clusters vectors with spherical k-means and only scans the lists of
+  the closest centroids (approximate, much faster on large stores).
+
+Both support incremental add/remove and persist as memory-mapped ``.npy``
+arrays (see memory_log.write_array_snapshot), so a saved index opens without
+copying its vectors.
+
+Vectors can be stored quantized (``precision``): 'float16' halves the memory
+and 'int8' (one float32 scale per vector) quarters it. Quantized vectors are
+decoded to float32 in blocks while scoring, so similarities are approximate;
+IntelligentMemoryManager can re-score the top candidates exactly.
+"""
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from memory_log import read_array_snapshot, write_array_snapshot
+
+# Storage dtype of each vector precision
+PRECISIONS = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+
+# Rows decoded at a time when scoring quantized vectors, so the float32 copy stays in cache
+_DECODE_BLOCK = 1024
+
+
+def normalize(vector) -> np.ndarray:
+    """Return a float32 copy of vector scaled to unit length (zero vectors stay zero)."""
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector.copy()
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """Row-wise version of normalize for an (n, d) matrix."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def quantize_rows(matrix: np.ndarray, precision: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Return matrix stored at precision and, for int8, the per-row scales that decode it."""
+    if precision != 'int8':
+        return matrix.astype(PRECISIONS[precision]), None
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def top_k_rows(scores: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """Return the rows of the k highest scores, best first.
+
+    Uses argpartition to find the k-th best score and only sorts the candidates
+    at or above it. Ties are broken by row order, which is what a stable
+    descending sort produces.
+    """
+    rows = np.arange(len(scores)) if mask is None else np.flatnonzero(mask)
+    if k <= 0 or rows.size == 0:
+        return rows[:0]
+
+    candidate_scores = scores[rows]
+    if k < rows.size:
+        kth_score = candidate_scores[np.argpartition(-candidate_scores, k - 1)[:k]].min()
+        keep = candidate_scores >= kth_score
+        rows, candidate_scores = rows[keep], candidate_scores[keep]
+
+    order = np.lexsort((rows, -candidate_scores))
+    return rows[order[:k]]
+
+
+class VectorIndex:
+    """Interface shared by all vector index backends."""
+
+    kind = None
+    precision = 'float32'
+    # True if the saved form would only repeat the vectors it was built from, so
+    # a store should rebuild the index from its embeddings instead of saving it
+    rebuildable = False
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __contains__(self, memory_id: int) -> bool:
+        raise NotImplementedError
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Ids of all indexed vectors."""
+        raise NotImplementedError
+
+    def add(self, memory_id: int, vector):
+        raise NotImplementedError
+
+    def add_many(self, memory_ids: Sequence[int], vectors: Sequence):
+        """add() for each id and vector, in order."""
+        for memory_id, vector in zip(memory_ids, vectors):
+            self.add(memory_id, vector)
+
+    def remove(self, memory_id: int):
+        raise NotImplementedError
+
+    def search(self, query, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, similarities) of up to k nearest vectors, best first."""
+        raise NotImplementedError
+
+    def search_batch(self, queries, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """search() for each row of an (n, d) query matrix."""
+        return [self.search(query, k) for query in queries]
+
+    def similarity(self, memory_ids: Iterable[int], query) -> np.ndarray:
+        """Exact cosine similarity between query and the given indexed vectors."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def save(self, directory: str, name: str = 'vector_index'):
+        raise NotImplementedError
+
+    def load(self, directory: str, name: str = 'vector_index'):
+        """Replace the index contents with a saved index of the same kind."""
+        raise NotImplementedError
+
+
+class FlatIndex(VectorIndex):
+    """Exact index: a contiguous, pre-normalized float32 matrix scanned with one product.
+
+    Rows are packed; removing a vector moves the last row into its slot so
+    deletes are O(d). Storage grows geometrically so adds are amortized O(1).
+    A loaded index searches the memory-mapped file directly and only copies the
+    vectors into RAM on its first mutation.
+    """
+
+    kind = 'flat'
+
+    def __init__(self, precision: str = 'float32'):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}', expected one of {sorted(PRECISIONS)}")
+        self.precision = precision
+        self.clear()
+
+    @property
+    def rebuildable(self) -> bool:
+        return self.precision == 'float32'
+
+    def clear(self):
+        self._size = 0
+        self._dim: Optional[int] = None
+        self._vectors = np.zeros((0, 0), dtype=PRECISIONS[self.precision])
+        self._scales = np.zeros(0, dtype=np.float32)  # int8 only: vector = stored row * scale
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._row_of: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, memory_id: int) -> bool:
+        return memory_id in self._row_of
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self._size]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The indexed vectors as float32 (decoded, so a copy, if quantized)."""
+        return self._decode(slice(0, self._size))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of vector storage in use."""
+        scale_bytes = self._scales.itemsize * self._size if self.precision == 'int8' else 0
+        return self._vectors[:self._size].nbytes + scale_bytes
+
+    def _decode(self, rows) -> np.ndarray:
+        """The stored vectors at rows (a slice or index array) as float32."""
+        if self.precision == 'float32':
+            return self._vectors[rows]
+        vectors = self._vectors[rows].astype(np.float32)
+        if self.precision == 'int8':
+            vectors *= self._scales[rows][:, None]
+        return vectors
+
+    def _scores(self, rows: Optional[np.ndarray], queries: np.ndarray) -> np.ndarray:
+        """Dot products of the given rows (all if None) with a query vector or (n, d) query matrix."""
+        if self.precision == 'float32':
+            return (self.vectors if rows is None else self._vectors[rows]) @ queries.T
+        count = self._size if rows is None else len(rows)
+        scores = np.empty((count,) + queries.shape[:-1], dtype=np.float32)
+        for start in range(0, count, _DECODE_BLOCK):
+            stop = min(start + _DECODE_BLOCK, count)
+            block = slice(start, stop) if rows is None else rows[start:stop]
+            block_scores = self._vectors[block].astype(np.float32) @ queries.T
+            if self.precision == 'int8':
+                block_scores = (block_scores.T * self._scales[block]).T
+            scores[start:stop] = block_scores
+        return scores
+
+    def _reserve(self, rows: int):
+        capacity = len(self._ids)
+        if rows <= capacity:
+            return
+        capacity = max(rows, 2 * capacity, 64)
+        vectors = np.zeros((capacity, self._dim), dtype=PRECISIONS[self.precision])
+        vectors[:self._size] = self._vectors[:self._size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self._size] = self.ids
+        self._vectors, self._ids = vectors, ids
+        if self.precision == 'int8':
+            scales = np.zeros(capacity, dtype=np.float32)
+            scales[:self._size] = self._scales[:self._size]
+            self._scales = scales
+
+    def _make_writable(self):
+        if not self._vectors.flags.writeable:
+            self._vectors = np.array(self._vectors)
+            self._scales = np.array(self._scales)
+
+    def add(self, memory_id: int, vector):
+        if memory_id in self._row_of:
+            raise ValueError(f"Memory {memory_id} is already indexed")
+        vector = normalize(vector)
+        if self._dim is None:
+            self._dim = len(vector)
+            self._vectors = np.zeros((0, self._dim), dtype=PRECISIONS[self.precision])
+        elif len(vector) != self._dim:
+            raise ValueError(f"Expected a {self._dim}-dimensional vector, got {len(vector)}")
+
+        self._reserve(self._size + 1)
+        row = self._size
+        stored, scales = quantize_rows(vector[None, :], self.precision)
+        self._vectors[row] = stored[0]
+        if scales is not None:
+            self._scales[row] = scales[0]
+        self._ids[row] = memory_id
+        self._row_of[memory_id] = row
+        self._size += 1
+        self._on_add(row)
+
+    def add_many(self, memory_ids: Sequence[int], vectors: Sequence):
+        """add() for each id and vector, in order, normalizing and storing them in blocks."""
+        memory_ids = [int(i) for i in memory_ids]
+        if len(memory_ids) != len(vectors):
+            raise ValueError(f"Got {len(memory_ids)} ids for {len(vectors)} vectors")
+        if not memory_ids:
+            return
+        if len(set(memory_ids)) != len(memory_ids) or any(i in self._row_of for i in memory_ids):
+            raise ValueError("Memories are already indexed or repeated")
+        dim = len(vectors[0])
+        if self._dim is None:
+            self._dim = dim
+            self._vectors = np.zeros((0, dim), dtype=PRECISIONS[self.precision])
+        elif dim != self._dim:
+            raise ValueError(f"Expected {self._dim}-dimensional vectors, got {dim}")
+
+        start = self._size
+        self._reserve(start + len(memory_ids))
+        for offset in range(0, len(memory_ids), _DECODE_BLOCK):
+            block = normalize_rows(np.asarray(vectors[offset:offset + _DECODE_BLOCK], dtype=np.float32))
+            if block.shape[1] != self._dim:
+                raise ValueError(f"Expected {self._dim}-dimensional vectors, got {block.shape[1]}")
+            rows = slice(start + offset, start + offset + len(block))
+            stored, scales = quantize_rows(block, self.precision)
+            self._vectors[rows] = stored
+            if scales is not None:
+                self._scales[rows] = scales
+        self._ids[start:start + len(memory_ids)] = memory_ids
+        self._row_of.update(zip(memory_ids, range(start, start + len(memory_ids))))
+        for row in range(start, start + len(memory_ids)):
+            self._size = row + 1
+            self._on_add(row)
+
+    def remove(self, memory_id: int):
+        self._make_writable()
+        row = self._row_of.pop(memory_id)
+        last = self._size - 1
+        self._on_remove(row)
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            if self.precision == 'int8':
+                self._scales[row] = self._scales[last]
+            self._ids[row] = self._ids[last]
+            self._row_of[int(self._ids[row])] = row
+            self._on_move(last, row)
+        self._size = last
+
+    def _on_add(self, row: int):
+        """Hook for subclasses that keep per-row structures."""
+
+    def _on_remove(self, row: int):
+        """Hook called before row is vacated."""
+
+    def _on_move(self, source: int, target: int):
+        """Hook called after the vector at source was moved to target."""
+
+    def _search_rows(self, rows: Optional[np.ndarray], query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        similarities = self._scores(rows, query)
+        best = top_k_rows(similarities, k)
+        if rows is None:
+            return self.ids[best], similarities[best]
+        return self._ids[rows[best]], similarities[best]
+
+    def search(self, query, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return self._search_rows(None, normalize(query), k)
+
+    def search_batch(self, queries, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Score all queries against every vector with one matrix product."""
+        if self._size == 0:
+            return super().search_batch(queries, k)
+        similarities = self._scores(None, normalize_rows(queries)).T
+        results = []
+        for row in similarities:
+            best = top_k_rows(row, k)
+            results.append((self.ids[best], row[best]))
+        return results
+
+    def similarity(self, memory_ids: Iterable[int], query) -> np.ndarray:
+        rows = np.fromiter((self._row_of[i] for i in memory_ids), dtype=np.intp)
+        if rows.size == 0:
+            return np.zeros(0, dtype=np.float32)
+        return self._scores(rows, normalize(query))
+
+    def _state(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        arrays = {'ids': self.ids, 'vectors': self._vectors[:self._size]}
+        if self.precision == 'int8':
+            arrays['scales'] = self._scales[:self._size]
+        return {'kind': self.kind, 'precision': self.precision}, arrays
+
+    def _restore(self, header: Dict, arrays: Dict[str, np.ndarray]):
+        self.clear()
+        ids, vectors = arrays['ids'], arrays['vectors']
+        self._dim = vectors.shape[1] if vectors.ndim == 2 and vectors.shape[1] else None
+        self._vectors = vectors
+        if self.precision == 'int8':
+            self._scales = arrays['scales']
+        self._ids = np.array(ids, dtype=np.int64)
+        self._size = len(ids)
+        self._row_of = dict(zip(self._ids.tolist(), range(self._size)))
+
+    def save(self, directory: str, name: str = 'vector_index'):
+        header, arrays = self._state()
+        write_array_snapshot(directory, name, header, arrays)
+
+    def load(self, directory: str, name: str = 'vector_index'):
+        snapshot = read_array_snapshot(directory, name)
+        if snapshot is None:
+            raise FileNotFoundError(f"No saved index '{name}' in {directory}")
+        header, arrays = snapshot
+        if header['kind'] != self.kind:
+            raise ValueError(f"Saved index is '{header['kind']}', expected '{self.kind}'")
+        if header.get('precision', 'float32') != self.precision:
+            raise ValueError(f"Saved index is {header.get('precision', 'float32')}, expected {self.precision}")
+        self._restore(header, arrays)
+
+
+class IVFIndex(FlatIndex):
+    """Approximate index using an inverted file over spherical k-means clusters.
+
+    Until the store reaches ``train_size`` vectors it answers queries exactly.
+    Training then partitions the vectors into ``n_lists`` clusters (default
+    ~4*sqrt(n)); queries scan only the ``n_probe`` closest clusters. New vectors
+    join their nearest cluster, and the clustering is retrained once the store
+    has grown ``retrain_factor`` times since the last training.
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 16,
+                 train_size: int = 4096, retrain_factor: float = 4.0,
+                 iterations: int = 10, seed: int = 0, precision: str = 'float32'):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_size = train_size
+        self.retrain_factor = retrain_factor
+        self.iterations = iterations
+        self.seed = seed
+        super().__init__(precision)
+
+    def clear(self):
+        super().clear()
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._lists: List[List[int]] = []
+        self._trained_size = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def rebuildable(self) -> bool:
+        return False  # The clustering is worth keeping
+
+    def _reserve(self, rows: int):
+        super()._reserve(rows)
+        if len(self._assignments) < len(self._ids):
+            assignments = np.zeros(len(self._ids), dtype=np.int32)
+            assignments[:len(self._assignments)] = self._assignments
+            self._assignments = assignments
+
+    def _on_add(self, row: int):
+        if not self.is_trained:
+            if self._size >= self.train_size:
+                self.train()
+            return
+        if self._size >= self.retrain_factor * self._trained_size:
+            self.train()
+            return
+        cluster = int(np.argmax(self._centroids @ self._decode(slice(row, row + 1))[0]))
+        self._assignments[row] = cluster
+        self._lists[cluster].append(row)
+
+    def _on_remove(self, row: int):
+        if self.is_trained:
+            self._lists[self._assignments[row]].remove(row)
+
+    def _on_move(self, source: int, target: int):
+        if self.is_trained:
+            cluster = self._assignments[source]
+            members = self._lists[cluster]
+            members[members.index(source)] = target
+            self._assignments[target] = cluster
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk):
+            assignments[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        return assignments
+
+    def train(self):
+        """(Re)cluster all indexed vectors and rebuild the inverted lists."""
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(self._size)))
+        n_lists = min(n_lists, self._size)
+        if n_lists == 0:
+            return
+
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(self._size, 256 * n_lists)
+        rows = rng.choice(self._size, sample_size, replace=False)
+        sample = self._decode(rows)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            assignments = self._assign(sample, centroids)
+            order = np.argsort(assignments, kind='stable')
+            clusters, starts = np.unique(assignments[order], return_index=True)
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            centroids[clusters] = normalize_rows(sums)
+
+        self._centroids = centroids
+        for start in range(0, self._size, _DECODE_BLOCK):
+            block = slice(start, min(start + _DECODE_BLOCK, self._size))
+            self._assignments[block] = self._assign(self._decode(block), centroids)
+        self._rebuild_lists()
+        self._trained_size = self._size
+
+    def _rebuild_lists(self):
+        self._lists = [[] for _ in range(len(self._centroids))]
+        for row, cluster in enumerate(self._assignments[:self._size].tolist()):
+            self._lists[cluster].append(row)
+
+    def search(self, query, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self._size == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        query = normalize(query)
+        if not self.is_trained:
+            return self._search_rows(None, query, k)
+
+        probe = top_k_rows(self._centroids @ query, self.n_probe)
+        members = [self._lists[cluster] for cluster in probe]
+        rows = np.fromiter(chain.from_iterable(members), dtype=np.intp,
+                           count=sum(len(m) for m in members))
+        return self._search_rows(rows, query, k)
+
+    def search_batch(self, queries, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        # Each query probes its own lists, so there is no shared product to batch
+        return [self.search(query, k) for query in queries]
+
+    def _state(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        header, arrays = super()._state()
+        if self.is_trained:
+            header['trained_size'] = self._trained_size
+            arrays['centroids'] = self._centroids
+            arrays['assignments'] = self._assignments[:self._size]
+        return header, arrays
+
+    def _restore(self, header: Dict, arrays: Dict[str, np.ndarray]):
+        super()._restore(header, arrays)
+        self._assignments = np.zeros(len(self._ids), dtype=np.int32)
+        if 'centroids' in arrays:
+            self._centroids = np.array(arrays['centroids'], dtype=np.float32)
+            self._assignments[:self._size] = arrays['assignments']
+            self._trained_size = header['trained_size']
+            self._rebuild_lists()
+
+
+INDEX_TYPES = {index_type.kind: index_type for index_type in (FlatIndex, IVFIndex)}
+
+
+def create_index(kind: str = 'flat', **kwargs) -> VectorIndex:
+    """Create an empty index of the given kind ('flat' or 'ivf')."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown index kind '{kind}', expected one of {sorted(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](**kwargs)